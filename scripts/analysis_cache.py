@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of PDFAnalyzer.analyze_structure results.
+Entries are content-addressed by the SHA-256 of the PDF bytes plus the analyzer
+schema version, and evicted least-recently-used once the cache exceeds its size bound.
+"""
+
+import os
+import json
+import mmap
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / ".cache" / "analysis"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def file_sha256(filepath) -> str:
+    """Calculate SHA256 hash of a file.
+
+    The file is memory-mapped where possible, so hashlib digests it in one
+    call without copying and releases the GIL, letting threads hash in parallel.
+    """
+    sha256_hash = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                sha256_hash.update(mapped)
+        except (ValueError, OSError):
+            # Empty files and special files cannot be mapped
+            for byte_block in iter(lambda: f.read(HASH_BUFFER_SIZE), b""):
+                sha256_hash.update(byte_block)
+    return sha256_hash.hexdigest()
+
+
+def source_sha256(source) -> str:
+    """SHA-256 of a PDF path or in-memory buffer (bytes, bytearray, memoryview, mmap)."""
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        return hashlib.sha256(source).hexdigest()
+    return file_sha256(source)
+
+
+def evict_lru(cache_dir, pattern: str, max_bytes: int):
+    """Delete the least-recently-used files matching pattern until they fit in max_bytes."""
+    entries = []
+    total = 0
+    for entry in Path(cache_dir).glob(pattern):
+        try:
+            st = entry.stat()
+        except FileNotFoundError:
+            continue  # Evicted by another worker
+        entries.append((st.st_mtime, st.st_size, entry))
+        total += st.st_size
+
+    if total <= max_bytes:
+        return
+
+    entries.sort()
+    for _, size, entry in entries:
+        if total <= max_bytes:
+            break
+        try:
+            entry.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+class AnalysisCache:
+    """Size-bounded LRU cache of analysis results keyed by file hash and analyzer version.
+
+    Entries are stored as JSON, so integer dict keys come back as strings,
+    the same as in the printed output. Recency is tracked through file mtimes,
+    so the cache can be shared by several worker processes.
+    """
+
+    def __init__(self, version, cache_dir=DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.version = str(version)
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, pdf_path, variant: str = "") -> str:
+        """Cache key for a PDF path or buffer: content hash, analyzer version and output variant."""
+        return f"{source_sha256(pdf_path)}-v{self.version}{variant}"
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached analysis for key, or None on a miss."""
+        entry = self._entry_path(key)
+        try:
+            with open(entry, "r") as f:
+                analysis = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(entry)  # Mark as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return analysis
+
+    def put(self, key: str, analysis: Dict):
+        """Store an analysis atomically, then evict old entries if over the size bound."""
+        entry = self._entry_path(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=entry.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(analysis, f, default=str)
+            os.replace(tmp_path, entry)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self.evict()
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits in max_bytes."""
+        evict_lru(self.cache_dir, "*/*.json", self.max_bytes)
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Long-running local analysis service.
+A small asyncio HTTP/1.1 server (TCP or Unix socket) that accepts PDF bytes or
+local paths and runs PDFAnalyzer in a bounded pool of warm worker processes, so
+interpreter and PyMuPDF startup are paid once. Requests beyond the pool and its
+queue are refused with 503, so callers back off instead of piling up memory.
+
+Routes:
+  POST /analyze        PDF bytes, or JSON {"path": ...}; ?sections=a,b -> analysis JSON
+  POST /analyze.jsonl  same input -> JSONL stream (page records, then the document record)
+  POST /classify       same input -> fast rendering_approach estimate
+  POST /compare        JSON {"original": path, "translated": path, "layout": bool, "visual": bool}
+  GET  /health         pool and queue state
+
+The service reads any local path it is given, so bind it to localhost or a
+Unix socket only.
+"""
+
+import os
+import sys
+import json
+import queue
+import asyncio
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import fitz  # PyMuPDF
+
+from analysis_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from analyze_pdf_structure import (DEFAULT_CLASSIFY_CONFIDENCE, DEFAULT_MIN_PREVALENCE, SECTIONS,
+                                   PDFAnalyzer, _compare_pair, _make_cache, analyze_file)
+from visual_diff import DEFAULT_DPI as DEFAULT_VISUAL_DPI, DEFAULT_THUMBNAIL_DIR
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Jobs admitted beyond the busy workers before new requests get 503
+DEFAULT_QUEUE_SIZE = 16
+
+# Largest accepted request body
+MAX_BODY_BYTES = 512 * 1024 * 1024
+
+# Seconds a refused client is told to wait
+RETRY_AFTER_SECONDS = 1
+
+# JSONL records a stream buffers ahead of its reader; a worker blocks beyond that
+STREAM_BUFFER_RECORDS = 64
+
+# Seconds a blocked stream worker waits between checks that its client is still there,
+# and a stream reader thread between checks that its request is still running
+STREAM_POLL_SECONDS = 0.5
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 422: "Unprocessable Entity",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class RequestError(Exception):
+    """A request the service answers with an HTTP error status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _warm_worker():
+    """Pool initializer: load PyMuPDF and its built-in fonts before the first job."""
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), "warm-up")
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _analyze_job(source, display_name: str, sections, cache_dir, cache_max_bytes: int,
+                 analyzer_options: Dict) -> Dict:
+    """Process pool job: full or sectioned analysis of a path or PDF bytes, through the shared analysis cache."""
+    return analyze_file(source, _make_cache(cache_dir, cache_max_bytes), sections,
+                        filename=display_name, **analyzer_options)
+
+
+def _classify_job(source, display_name: str, confidence: float, min_prevalence: float,
+                  analyzer_options: Dict) -> Dict:
+    """Process pool job: fast rendering-approach estimate."""
+    analyzer = PDFAnalyzer(source, filename=display_name, **analyzer_options)
+    try:
+        return analyzer.classify_rendering(confidence, min_prevalence)
+    finally:
+        analyzer.close()
+
+
+def _put_record(records, stop, item) -> bool:
+    """Put item on the bounded records queue, waiting while it is full; False once stop is set."""
+    while not stop.is_set():
+        try:
+            records.put(item, timeout=STREAM_POLL_SECONDS)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _stream_job(source, display_name: str, analyzer_options: Dict, records, stop) -> int:
+    """Process pool job: put JSONL lines on the records queue as pages are analyzed, then None.
+
+    Stops between pages once the stop event is set (the client went away).
+    """
+    count = 0
+    try:
+        analyzer = PDFAnalyzer(source, filename=display_name, **analyzer_options)
+        try:
+            for record in analyzer.iter_analysis():
+                if not _put_record(records, stop, json.dumps(record, default=str) + "\n"):
+                    break
+                count += 1
+        finally:
+            analyzer.close()
+    except Exception as e:
+        _put_record(records, stop, json.dumps({"record": "error", "error": f"{type(e).__name__}: {e}"}) + "\n")
+    finally:
+        _put_record(records, stop, None)
+    return count
+
+
+class AnalysisService:
+    """Bounded, warm process pool behind an asyncio HTTP front end."""
+
+    def __init__(self, workers: Optional[int] = None, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 cache_dir=DEFAULT_CACHE_DIR, cache_max_bytes: int = DEFAULT_MAX_BYTES,
+                 analyzer_options: Optional[Dict] = None, thumbnail_dir=DEFAULT_THUMBNAIL_DIR):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = self.workers + queue_size
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.thumbnail_dir = thumbnail_dir
+        self.analyzer_options = analyzer_options or {}
+        self.pending = 0
+        self.completed = 0
+        self.refused = 0
+        self.executor = None
+        self.stream_readers = None
+        self.manager = None
+
+    async def start(self):
+        """Start the workers and wait until each has warmed up."""
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        # One reader thread per admitted request, so a stream still queued for a worker
+        # never holds the thread the running stream needs to drain its records
+        self.stream_readers = ThreadPoolExecutor(max_workers=self.max_pending + self.workers,
+                                                 thread_name_prefix="stream-reader")
+        self.manager = multiprocessing.Manager()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _ping) for _ in range(self.workers)))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+        if self.stream_readers is not None:
+            self.stream_readers.shutdown(cancel_futures=True)
+        if self.manager is not None:
+            self.manager.shutdown()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection until the client closes it or asks to.
+
+        Errors become an HTTP error response: RequestError with its status,
+        anything unexpected with 500.
+        """
+        try:
+            while True:
+                try:
+                    request = await self._read_head(reader)
+                except RequestError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    return
+                if request is None:
+                    return
+                method, target, headers = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    keep_alive = await self._dispatch(method, target, headers, reader, writer, keep_alive)
+                except RequestError as e:
+                    # The body may be unread, so the connection cannot be reused
+                    keep_alive = False
+                    await self._send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    keep_alive = False
+                    print(f"Error serving {method} {target}: {type(e).__name__}: {e}", file=sys.stderr)
+                    await self._send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"}, keep_alive=False)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_head(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str]]]:
+        """Request line and headers, or None at end of stream."""
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+        except ValueError:
+            raise RequestError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return method, target, headers
+
+    async def _read_body(self, reader: asyncio.StreamReader, headers: Dict[str, str]) -> bytes:
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise RequestError(411, "Chunked uploads are not supported; send Content-Length")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise RequestError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise RequestError(413, f"Body exceeds {MAX_BODY_BYTES} bytes")
+        return await reader.readexactly(length) if length else b""
+
+    async def _dispatch(self, method: str, target: str, headers: Dict[str, str],
+                        reader: asyncio.StreamReader, writer: asyncio.StreamWriter, keep_alive: bool) -> bool:
+        """Route one request; returns whether the connection can serve another."""
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        routes = {
+            "/analyze": self._analyze,
+            "/analyze.jsonl": self._analyze_stream,
+            "/classify": self._classify,
+            "/compare": self._compare,
+        }
+
+        if url.path == "/health":
+            if method != "GET":
+                raise RequestError(405, "Use GET")
+            await self._send_json(writer, 200, self.health(), keep_alive)
+            return keep_alive
+        if url.path not in routes:
+            raise RequestError(404, f"No route {url.path}")
+        if method != "POST":
+            raise RequestError(405, "Use POST")
+
+        # Backpressure: refuse before reading the upload, and drop the connection
+        if self.pending >= self.max_pending:
+            self.refused += 1
+            await self._send_json(writer, 503, {"error": "Queue full", "retry_after": RETRY_AFTER_SECONDS},
+                                  keep_alive=False, extra_headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+            return False
+
+        self.pending += 1
+        try:
+            body = await self._read_body(reader, headers)
+            await routes[url.path](headers, query, body, writer, keep_alive)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+        return keep_alive
+
+    def health(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "refused": self.refused,
+        }
+
+    async def _with_input(self, headers: Dict[str, str], query: Dict[str, str], body: bytes, job):
+        """Run job(source, display_name, request) on uploaded PDF bytes or a JSON path.
+
+        Uploads go to the worker as bytes and are opened in memory, without a temp file.
+        """
+        content_type = headers.get("content-type", "")
+        if content_type.startswith("application/json"):
+            request = self._json_object(body)
+            path = request.get("path")
+            if not isinstance(path, str) or not Path(path).is_file():
+                raise RequestError(400, f"No such file: {path}")
+            return await job(path, str(request.get("filename") or Path(path).name), request)
+
+        if not body:
+            raise RequestError(400, "Send PDF bytes, or JSON {\"path\": ...}")
+        return await job(body, query.get("filename", "upload.pdf"), query)
+
+    def _json_object(self, body: bytes) -> Dict:
+        try:
+            request = json.loads(body or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise RequestError(400, f"Invalid JSON: {e}")
+        if not isinstance(request, dict):
+            raise RequestError(400, "Expected a JSON object")
+        return request
+
+    def _number(self, request: Dict, name: str, default: float) -> float:
+        value = request.get(name, default)
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise RequestError(400, f"{name} must be a number, got {value!r}")
+
+    def _sections(self, request: Dict):
+        sections = request.get("sections")
+        if isinstance(sections, str):
+            sections = [section for section in sections.split(",") if section]
+        if sections is not None:
+            if not isinstance(sections, list) or not all(isinstance(section, str) for section in sections):
+                raise RequestError(400, "sections must be a list of section names")
+            unknown = set(sections).difference(SECTIONS)
+            if unknown:
+                raise RequestError(400, f"Unknown sections: {', '.join(sorted(unknown))}")
+        return sections
+
+    async def _run(self, func, *args):
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        except Exception as e:
+            raise RequestError(422, f"{type(e).__name__}: {e}")
+
+    async def _analyze(self, headers, query, body, writer, keep_alive):
+        async def job(source, display_name, request):
+            return await self._run(_analyze_job, source, display_name, self._sections(request),
+                                   self.cache_dir, self.cache_max_bytes, self.analyzer_options)
+        await self._send_json(writer, 200, await self._with_input(headers, query, body, job), keep_alive)
+
+    async def _classify(self, headers, query, body, writer, keep_alive):
+        async def job(source, display_name, request):
+            confidence = self._number(request, "confidence", DEFAULT_CLASSIFY_CONFIDENCE)
+            min_prevalence = self._number(request, "min_prevalence", DEFAULT_MIN_PREVALENCE)
+            return await self._run(_classify_job, source, display_name, confidence, min_prevalence,
+                                   self.analyzer_options)
+        await self._send_json(writer, 200, await self._with_input(headers, query, body, job), keep_alive)
+
+    async def _compare(self, headers, query, body, writer, keep_alive):
+        request = self._json_object(body)
+        pair = {"original": request.get("original"), "translated": request.get("translated")}
+        for path in pair.values():
+            if not isinstance(path, str) or not Path(path).is_file():
+                raise RequestError(400, f"No such file: {path}")
+        record = await self._run(_compare_pair, pair, self.cache_dir, self.cache_max_bytes,
+                                 self.analyzer_options, bool(request.get("layout")), bool(request.get("visual")),
+                                 DEFAULT_VISUAL_DPI, self.thumbnail_dir)
+        status = 422 if "error" in record else 200
+        await self._send_json(writer, status, record, keep_alive)
+
+    async def _analyze_stream(self, headers, query, body, writer, keep_alive):
+        loop = asyncio.get_running_loop()
+
+        async def job(source, display_name, request):
+            # Bounded, so a slow reader holds the worker back instead of buffering the document
+            records = self.manager.Queue(maxsize=STREAM_BUFFER_RECORDS)
+            stop = self.manager.Event()
+            future = loop.run_in_executor(self.executor, _stream_job, source, display_name,
+                                          self.analyzer_options, records, stop)
+            try:
+                writer.write(self._head(200, "application/x-ndjson", keep_alive,
+                                        {"Transfer-Encoding": "chunked"}))
+                while True:
+                    try:
+                        line = await loop.run_in_executor(self.stream_readers, records.get,
+                                                          True, STREAM_POLL_SECONDS)
+                    except queue.Empty:
+                        continue
+                    if line is None:
+                        break
+                    data = line.encode()
+                    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    await writer.drain()  # A slow reader slows this stream, not the others
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+            finally:
+                # On a disconnect, stop the worker and stay admitted until it is free again
+                stop.set()
+                await asyncio.wait([future])
+            future.result()
+
+        await self._with_input(headers, query, body, job)
+
+    def _head(self, status: int, content_type: str, keep_alive: bool,
+              extra_headers: Optional[Dict[str, str]] = None) -> bytes:
+        lines = [
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines.extend(f"{name}: {value}" for name, value in (extra_headers or {}).items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool,
+                         extra_headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload, default=str).encode()
+        headers = dict(extra_headers or {}, **{"Content-Length": str(len(data))})
+        writer.write(self._head(status, "application/json", keep_alive, headers) + data)
+        await writer.drain()
+
+
+async def serve(service: AnalysisService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                unix_socket: Optional[str] = None):
+    """Warm the pool, then serve until cancelled."""
+    await service.start()
+    if unix_socket:
+        server = await asyncio.start_unix_server(service.handle_connection, path=unix_socket)
+        where = unix_socket
+    else:
+        server = await asyncio.start_server(service.handle_connection, host, port)
+        where = f"http://{host}:{port}"
+    print(f"Analysis service on {where} ({service.workers} workers, "
+          f"up to {service.max_pending} jobs admitted)", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve PDF analysis over HTTP with a warm process pool")
+    parser.add_argument('--host', default=DEFAULT_HOST, help='Interface to bind (keep it local)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='TCP port')
+    parser.add_argument('--unix', help='Serve on this Unix socket path instead of TCP')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help='Jobs admitted beyond the busy workers before requests are refused with 503')
+    parser.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR, help='Analysis cache directory')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always re-analyze and re-render instead of using the analysis and thumbnail caches')
+    parser.add_argument('--thumbnail-dir', type=Path, default=DEFAULT_THUMBNAIL_DIR,
+                        help='Where visual comparisons cache their page renders')
+    parser.add_argument('--deep-images', action='store_true',
+                        help='Decode every unique image to inspect its colorspace (slow on scanned PDFs)')
+
+    args = parser.parse_args()
+
+    service = AnalysisService(args.workers, args.queue_size, None if args.no_cache else args.cache_dir,
+                              analyzer_options={"deep_images": args.deep_images},
+                              thumbnail_dir=None if args.no_cache else args.thumbnail_dir)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,38 +5,825 @@ Examines PDF structure, fonts, text extraction methods, and layout preservation.
 """
 
 import fitz  # PyMuPDF
+import gc
+import os
+import math
 import sys
 import json
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Any
+from time import perf_counter
+from typing import Dict, List, Any, Iterator, Optional
 import hashlib
 
+from analysis_cache import AnalysisCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from coverage_grid import boxes_to_array, page_coverage
+from layout_diff import diff_layout
+from pdf_source import as_view, is_buffer, open_pdf, source_name, source_size
+from profiling import PROFILE_MODES, NullTimer, SectionTimer, capture_profile
+from visual_diff import (DEFAULT_DPI as DEFAULT_VISUAL_DPI, DEFAULT_THUMBNAIL_DIR, DEFAULT_THUMBNAIL_MAX_BYTES,
+                         diff_visual)
+
+# Bump whenever the analyze_structure output changes, so cached results are invalidated
+ANALYZER_VERSION = 5
+
+REPO_ROOT = Path(__file__).parent.parent
+ORIGINALS_DIR = REPO_ROOT / "originals"
+TRANSLATED_DIR = REPO_ROOT / "translated"
+DEFAULT_PROFILE_DIR = REPO_ROOT / ".cache" / "profiles"
+
+# Pages sampled by the text extraction section
+TEXT_SAMPLE_PAGES = 3
+
+# Fewest pages between memory-triggered releases; freed memory is not always returned
+# to the OS, so RSS can stay above the limit right after a release
+MIN_WINDOW_PAGES = 8
+
+# Analyzer options that change the output; the others only affect how it is computed
+OUTPUT_OPTIONS = {"deep_images"}
+
+# Analyzer options that measure a run; a cached result cannot answer them
+MEASUREMENT_OPTIONS = {"timings", "profile"}
+
+# analyze_structure output sections, in output order
+HEADER_SECTIONS = ("metadata", "document_info")
+COLLECTOR_SECTIONS = ("fonts", "images", "form_fields", "text_extraction", "rendering_approach", "resources")
+SECTIONS = HEADER_SECTIONS + ("pages",) + COLLECTOR_SECTIONS
+
+# Sections whose collectors read another section's collector
+SECTION_DEPENDENCIES = {"rendering_approach": ("fonts",), "resources": ("fonts",)}
+
+# Text extraction flags for span geometry; leaves out image blocks and their pixel data
+SPAN_TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+# Colorspace names for the component count (/N) of an ICC profile
+ICC_COMPONENTS = {"1": "Gray", "3": "RGB", "4": "CMYK"}
+
+# Share of pages with images above which a document counts as rasterized
+RASTER_PAGE_RATIO = 0.8
+
+# Fast rendering classifier: stop once the label reaches this confidence...
+DEFAULT_CLASSIFY_CONFIDENCE = 0.95
+# ...treating text or embedded fonts as absent once a signal covering this share of pages would have shown up
+DEFAULT_MIN_PREVALENCE = 0.2
+# Pages are sampled round-robin from this many equal strata, in random order within each
+SAMPLE_STRATA = 8
+
+
+class PageRanges:
+    """A set of pages stored as sorted, disjoint [start, stop) runs.
+
+    Pages arrive in document order, so add() only extends or opens the last run:
+    O(1) per page, and a resource used on every page of a book is a single run.
+    """
+
+    __slots__ = ("runs",)
+
+    def __init__(self, runs=None):
+        self.runs = [list(run) for run in runs] if runs else []
+
+    def add(self, page: int):
+        """Add a page at or after the last one added."""
+        self._append(page, page + 1)
+
+    def extend(self, other: "PageRanges"):
+        """Add the runs of a collector that saw later pages."""
+        for start, stop in other.runs:
+            self._append(start, stop)
+
+    def union(self, other: "PageRanges") -> "PageRanges":
+        merged = PageRanges()
+        for start, stop in sorted(self.runs + other.runs):
+            merged._append(start, stop)
+        return merged
+
+    def _append(self, start: int, stop: int):
+        runs = self.runs
+        if runs and start <= runs[-1][1]:
+            runs[-1][1] = max(runs[-1][1], stop)
+        else:
+            runs.append([start, stop])
+
+    def __len__(self) -> int:
+        return sum(stop - start for start, stop in self.runs)
+
+    def __iter__(self) -> Iterator[int]:
+        for start, stop in self.runs:
+            yield from range(start, stop)
+
+
+class FontCollector:
+    """Collects fonts used across the document, keyed by xref.
+
+    result() is the per-name view: fonts sharing a name across xrefs are listed
+    once, with all their xrefs and the union of their pages.
+    """
+
+    def __init__(self):
+        self.by_xref = {}
+
+    def add(self, page_data: Dict):
+        page_num = page_data["page_num"]
+        by_xref = self.by_xref
+        for font in page_data["fonts"]:
+            xref = font[0]
+            if xref not in by_xref:
+                xref, ext, font_type, basefont, _, encoding = font[:6]
+                by_xref[xref] = {
+                    "name": basefont,
+                    "type": font_type,
+                    "encoding": encoding,
+                    "embedded": ext != "n/a",  # Font file present
+                    "pages": PageRanges(),
+                }
+            by_xref[xref]["pages"].add(page_num)
+
+    def merge(self, other: "FontCollector"):
+        """Fold in a collector that saw later pages."""
+        for xref, font in other.by_xref.items():
+            if xref in self.by_xref:
+                self.by_xref[xref]["pages"].extend(font["pages"])
+            else:
+                self.by_xref[xref] = font
+
+    def result(self) -> Dict:
+        fonts = {}
+        for xref, font in self.by_xref.items():
+            font_name = font["name"]
+            if font_name not in fonts:
+                fonts[font_name] = {
+                    "name": font_name,
+                    "type": font["type"],
+                    "encoding": font["encoding"],
+                    "xref": xref,  # First xref seen under this name
+                    "xrefs": [],
+                    "pages_used": PageRanges(),
+                    "is_embedded": False,
+                }
+            fonts[font_name]["is_embedded"] |= font["embedded"]
+            fonts[font_name]["xrefs"].append(xref)
+            fonts[font_name]["pages_used"] = fonts[font_name]["pages_used"].union(font["pages"])
+        for font in fonts.values():
+            font["pages_used"] = font["pages_used"].runs
+        return fonts
+
+
+class ImageCollector:
+    """Collects image counts per page and per-image properties, deduplicated by xref.
+
+    Colorspace, dimensions, bits per component and filter are read from the
+    image dictionary, so no pixel data is decoded. With deep_images=True each
+    unique image is also decoded into a Pixmap to report MuPDF's colorspace.
+    """
+
+    def __init__(self, deep_images: bool = False):
+        self.deep_images = deep_images
+        self.images_info = {
+            "total_count": 0,
+            "by_page": {},
+            "formats": set(),
+            "unique_count": 0,
+            "by_xref": {},
+        }
+
+    def add(self, page_data: Dict):
+        image_list = page_data["images"]
+        if not image_list:
+            return
+        page_num = page_data["page_num"]
+        self.images_info["by_page"][page_num] = len(image_list)
+        self.images_info["total_count"] += len(image_list)
+
+        doc = page_data["page"].parent
+        by_xref = self.images_info["by_xref"]
+        for img in image_list:
+            xref = img[0]
+            if xref in by_xref:
+                by_xref[xref]["occurrences"] += 1
+                continue
+            image = self._describe_image(doc, img)
+            by_xref[xref] = image
+            self.images_info["formats"].add(image["colorspace"])
+
+    def merge(self, other: "ImageCollector"):
+        """Fold in a collector that saw later pages."""
+        self.images_info["total_count"] += other.images_info["total_count"]
+        self.images_info["by_page"].update(other.images_info["by_page"])
+        self.images_info["formats"] |= other.images_info["formats"]
+        by_xref = self.images_info["by_xref"]
+        for xref, image in other.images_info["by_xref"].items():
+            if xref in by_xref:
+                by_xref[xref]["occurrences"] += image["occurrences"]
+            else:
+                by_xref[xref] = image
+
+    def _describe_image(self, doc, img) -> Dict:
+        """Image properties from a get_images() entry and its dictionary."""
+        xref, _, width, height, bpc, cs_name, _, _, image_filter = img[:9]
+        image = {
+            "width": width,
+            "height": height,
+            "bits_per_component": bpc,
+            "colorspace": self._colorspace_name(doc, xref, cs_name),
+            "filter": image_filter,
+            "occurrences": 1,
+        }
+        if self.deep_images:
+            try:
+                pix = fitz.Pixmap(doc, xref)
+                image["colorspace"] = pix.colorspace.name if pix.colorspace else "unknown"
+                pix = None
+            except:
+                image["colorspace"] = "unknown"
+        return image
+
+    def _colorspace_name(self, doc, xref: int, cs_name: str) -> str:
+        """Resolve the /ColorSpace of an image dictionary to a readable name."""
+        try:
+            kind, value = doc.xref_get_key(xref, "ColorSpace")
+            return self._describe_colorspace(doc, kind, value) or cs_name or "unknown"
+        except Exception:
+            return cs_name or "unknown"
+
+    def _describe_colorspace(self, doc, kind: str, value: str, depth: int = 0) -> Optional[str]:
+        if depth > 4:
+            return None
+        if kind == "name":
+            return value.lstrip("/")
+        if kind == "xref":
+            value = doc.xref_object(int(value.split()[0]), compressed=True)
+            kind = "array" if value.startswith("[") else "name"
+            return self._describe_colorspace(doc, kind, value, depth + 1)
+        if kind != "array":
+            return None
+
+        body = value.strip()[1:-1].strip()
+        family, _, rest = body.partition(" ")
+        family = family.lstrip("/")
+        rest = rest.strip()
+        if family == "ICCBased":
+            icc_xref = int(rest.split()[0])
+            components = doc.xref_get_key(icc_xref, "N")[1]
+            return f"ICCBased({ICC_COMPONENTS.get(components, components)})"
+        if family == "Indexed":
+            base = self._describe_indexed_base(doc, rest, depth)
+            return f"Indexed({base})" if base else family
+        return family
+
+    def _describe_indexed_base(self, doc, rest: str, depth: int) -> Optional[str]:
+        """Describe the base colorspace at the start of an /Indexed array."""
+        if rest.startswith("/"):
+            return rest.split()[0].lstrip("/")
+        if rest.startswith("["):
+            end = rest.index("]") + 1
+            return self._describe_colorspace(doc, "array", rest[:end], depth + 1)
+        tokens = rest.split()
+        if len(tokens) >= 3 and tokens[2] == "R":
+            return self._describe_colorspace(doc, "xref", " ".join(tokens[:3]), depth + 1)
+        return None
+
+    def result(self) -> Dict:
+        images_info = dict(self.images_info)
+        images_info["formats"] = list(self.images_info["formats"])
+        images_info["unique_count"] = len(self.images_info["by_xref"])
+        return images_info
+
+
+class FormCollector:
+    """Collects form widgets if the document is a form PDF."""
+
+    def __init__(self, is_form_pdf):
+        self.forms_info = {
+            "has_forms": is_form_pdf,
+            "field_count": 0,
+            "field_types": [],
+            "fields": []
+        }
+
+    def add(self, page_data: Dict):
+        for field_info in page_data["widgets"]:
+            self.forms_info["field_count"] += 1
+            self.forms_info["fields"].append(field_info)
+            if field_info["field_type"] not in self.forms_info["field_types"]:
+                self.forms_info["field_types"].append(field_info["field_type"])
+
+    def merge(self, other: "FormCollector"):
+        """Fold in a collector that saw later pages."""
+        self.add({"widgets": other.forms_info["fields"]})
+
+    def result(self) -> Dict:
+        return self.forms_info
+
+
+class TextCollector:
+    """Collects how text is stored and can be extracted, from the sampled pages."""
+
+    def __init__(self):
+        self.text_info = {
+            "extraction_methods": {},
+            "total_characters": 0,
+            "has_searchable_text": False,
+            "text_rendering_mode": None,
+        }
+
+    def add(self, page_data: Dict):
+        if page_data["page_num"] >= TEXT_SAMPLE_PAGES:
+            return
+        raw_text = page_data["text"]
+        methods = self.text_info["extraction_methods"]
+        methods["raw"] = len(raw_text) > 0
+        methods["blocks"] = len(page_data["blocks"]) > 0
+        methods["dict"] = len(page_data["text_dict"].get("blocks", [])) > 0
+
+        self.text_info["total_characters"] += len(raw_text)
+        if len(raw_text) > 10:
+            self.text_info["has_searchable_text"] = True
+
+    def merge(self, other: "TextCollector"):
+        """Fold in a collector that saw later pages."""
+        self.text_info["extraction_methods"].update(other.text_info["extraction_methods"])
+        self.text_info["total_characters"] += other.text_info["total_characters"]
+        self.text_info["has_searchable_text"] |= other.text_info["has_searchable_text"]
+
+    def result(self) -> Dict:
+        return self.text_info
+
+
+class RenderingCollector:
+    """Collects the page-level signals used to classify the rendering approach."""
+
+    def __init__(self, font_collector: FontCollector):
+        self.font_collector = font_collector
+        self.total_pages = 0
+        self.pages_with_images = 0
+        self.has_text = False
+
+    def add(self, page_data: Dict):
+        self.total_pages += 1
+        if page_data["images"]:
+            self.pages_with_images += 1
+        if len(page_data["text"]) > 10:
+            self.has_text = True
+
+    def merge(self, other: "RenderingCollector"):
+        """Fold in a collector that saw later pages; fonts are merged by their own collector."""
+        self.total_pages += other.total_pages
+        self.pages_with_images += other.pages_with_images
+        self.has_text |= other.has_text
+
+    def result(self) -> str:
+        image_ratio = self.pages_with_images / self.total_pages if self.total_pages > 0 else 0
+        fonts = self.font_collector.result()
+        embedded_fonts = sum(1 for f in fonts.values() if f["is_embedded"])
+        return _rendering_label(image_ratio, self.has_text, embedded_fonts > 0)
+
+
+class ResourceCollector:
+    """Inventory of the fonts, images and form XObjects used across the document, keyed by xref.
+
+    Each resource is listed once with the pages it is used on as [start, stop)
+    runs, so the inventory of a thousand-page document stays small.
+    """
+
+    def __init__(self, font_collector: FontCollector):
+        self.font_collector = font_collector
+        self.images = {}
+        self.xobjects = {}
+
+    def add(self, page_data: Dict):
+        page_num = page_data["page_num"]
+        for img in page_data["images"]:
+            xref = img[0]
+            if xref not in self.images:
+                self.images[xref] = {"width": img[2], "height": img[3], "pages": PageRanges()}
+            self.images[xref]["pages"].add(page_num)
+        for xobject in page_data["xobjects"]:
+            xref = xobject[0]
+            if xref not in self.xobjects:
+                self.xobjects[xref] = {"name": xobject[1], "pages": PageRanges()}
+            self.xobjects[xref]["pages"].add(page_num)
+
+    def merge(self, other: "ResourceCollector"):
+        """Fold in a collector that saw later pages; fonts are merged by their own collector."""
+        for mine, theirs in ((self.images, other.images), (self.xobjects, other.xobjects)):
+            for xref, resource in theirs.items():
+                if xref in mine:
+                    mine[xref]["pages"].extend(resource["pages"])
+                else:
+                    mine[xref] = resource
+
+    def result(self) -> Dict:
+        inventory = {
+            "fonts": self._report(self.font_collector.by_xref),
+            "images": self._report(self.images),
+            "xobjects": self._report(self.xobjects),
+        }
+        # Resources used on more than one page
+        inventory["shared"] = {
+            kind: sum(1 for resource in resources.values() if resource["page_count"] > 1)
+            for kind, resources in inventory.items()
+        }
+        return inventory
+
+    def _report(self, resources: Dict) -> Dict:
+        return {
+            xref: {**resource, "pages": resource["pages"].runs, "page_count": len(resource["pages"])}
+            for xref, resource in resources.items()
+        }
+
+
+def _rendering_label(image_ratio: float, has_text: bool, has_embedded_fonts: bool) -> str:
+    """Rendering approach from the share of pages with images, text presence and font embedding."""
+    if image_ratio > RASTER_PAGE_RATIO and not has_text:
+        return "FULL_RASTERIZATION"
+    elif image_ratio > RASTER_PAGE_RATIO and has_text:
+        return "IMAGE_WITH_OCR_OVERLAY"
+    elif has_embedded_fonts and has_text:
+        return "TEXT_REPLACEMENT_WITH_EMBEDDING"
+    elif has_text:
+        return "TEXT_REPLACEMENT_NATIVE"
+    else:
+        return "UNKNOWN"
+
+
+def _stratified_order(page_count: int, strata: int = SAMPLE_STRATA, seed: int = 0) -> List[int]:
+    """All page numbers, ordered so every prefix is a stratified random sample.
+
+    Pages are split into equal strata, shuffled within each, and drawn
+    round-robin, so the first few samples already span the whole document.
+    """
+    rng = random.Random(seed * 1000003 + page_count)
+    strata = max(1, min(strata, page_count))
+    bounds = [round(i * page_count / strata) for i in range(strata + 1)]
+    groups = []
+    for start, stop in zip(bounds, bounds[1:]):
+        group = list(range(start, stop))
+        rng.shuffle(group)
+        groups.append(group)
+    return [group[i] for i in range(max(map(len, groups), default=0)) for group in groups if i < len(group)]
+
+
+def _ratio_side_confidence(hits: int, sampled: int, population: int, threshold: float) -> float:
+    """Confidence that the population share is on the same side of threshold as the sample share.
+
+    Normal approximation around the Jeffreys estimate, with the finite
+    population correction for sampling pages without replacement.
+    """
+    if sampled >= population:
+        return 1.0
+    estimate = (hits + 0.5) / (sampled + 1)
+    stderr = math.sqrt(estimate * (1 - estimate) / sampled * (population - sampled) / (population - 1))
+    distance = estimate - threshold if hits / sampled > threshold else threshold - estimate
+    return 0.5 * (1 + math.erf(distance / (stderr * math.sqrt(2))))
+
+
+def _absence_confidence(sampled: int, population: int, min_prevalence: float) -> float:
+    """Confidence that a signal never seen in the sample is absent, if present on >= min_prevalence of pages."""
+    if sampled >= population:
+        return 1.0
+    return 1.0 - (1.0 - min_prevalence) ** sampled
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class PageData(dict):
+    """Everything extracted from one page, each item computed on first access.
+
+    extractors maps a key to (timer section, function of this PageData), so a
+    page pass only pays for the extraction calls its collectors actually read.
+    """
+
+    def __init__(self, page, page_num: int, extractors: Dict, timer, started: Optional[float] = None):
+        super().__init__(page=page, page_num=page_num, started=started)
+        self.extractors = extractors
+        self.timer = timer
+
+    def __missing__(self, key):
+        name, extract = self.extractors[key]
+        value = self[key] = self.timer.call(name, extract, self)
+        return value
+
+
+def _analyze_page_range(pdf_path: str, start: int, stop: int, analyzer_options: Dict,
+                        sections: List[str]):
+    """Process pool job: analyze pages [start, stop) with the worker's own document handle."""
+    analyzer = PDFAnalyzer(pdf_path, **dict(analyzer_options, page_workers=1))
+    try:
+        collectors = analyzer._make_collectors(sections)
+        pages = list(analyzer._iter_pages(collectors, start, stop, "pages" in sections))
+    finally:
+        analyzer.close()
+    return pages, collectors, analyzer.timer
+
+
 class PDFAnalyzer:
-    def __init__(self, pdf_path: str):
-        self.pdf_path = pdf_path
-        self.doc = fitz.open(pdf_path)
-        self.filename = Path(pdf_path).name
+    """Structure analysis of one PDF.
+
+    Memory is bounded with window_size (reopen the document every N pages)
+    and memory_limit_mb (end a window early once RSS passes the limit).
+    Between windows, page objects and MuPDF's resource store are released.
+    page_workers > 1 shards page ranges across processes that each open the file.
+
+    pdf_path may also be an in-memory buffer (bytes, bytearray, memoryview or
+    mmap), opened in place without a copy; filename names it in the output.
+    Buffers are always analyzed in this process, since sharding would copy them.
+
+    timings=True adds a "timings" block (and per-page "seconds") to the output;
+    profile="cprofile" or "tracemalloc" writes a profile per document to profile_dir.
+
+    analyze(sections) computes only the requested sections, extracting only the
+    page data their collectors read, and memoizes them for later calls.
+    """
+
+    def __init__(self, pdf_path: str, deep_images: bool = False, window_size: Optional[int] = None,
+                 memory_limit_mb: Optional[int] = None, page_workers: int = 1, timings: bool = False,
+                 profile: Optional[str] = None, profile_dir=DEFAULT_PROFILE_DIR,
+                 filename: Optional[str] = None):
+        # Buffers are viewed once, so window reopens and close() share the view
+        self.pdf_path = as_view(pdf_path) if is_buffer(pdf_path) else pdf_path
+        self._owns_view = is_buffer(pdf_path) and self.pdf_path is not pdf_path
+        self.deep_images = deep_images
+        self.window_size = window_size
+        self.memory_limit_mb = memory_limit_mb
+        self.page_workers = page_workers
+        self.timings = timings
+        self.profile = profile
+        self.profile_dir = Path(profile_dir)
+        self.timer = SectionTimer() if timings else NullTimer()
+        self.doc = self.timer.call("open", open_pdf, self.pdf_path)
+        self.filename = filename or source_name(pdf_path)
+        self._sections = {}
         
     def analyze_structure(self) -> Dict[str, Any]:
-        """Comprehensive PDF structure analysis."""
-        analysis = {
+        """Comprehensive PDF structure analysis in a single pass over the pages."""
+        return self.analyze()
+
+    def analyze(self, sections=None) -> Dict[str, Any]:
+        """Analysis restricted to the given sections (default: all of SECTIONS).
+
+        Sections not computed by an earlier call are computed together in one
+        page pass; the others come from the analyzer's memo.
+        """
+        wanted = set(SECTIONS if sections is None else sections)
+        unknown = wanted.difference(SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown sections: {', '.join(sorted(unknown))} "
+                             f"(choose from {', '.join(SECTIONS)})")
+
+        with capture_profile(self.profile, self.profile_dir / self.filename):
+            start = perf_counter()
+            missing = [section for section in SECTIONS if section in wanted and section not in self._sections]
+            if missing:
+                self._compute_sections(missing)
+            analysis = {"filename": self.filename}
+            analysis.update((section, self._sections[section]) for section in SECTIONS if section in wanted)
+            if self.timings:
+                analysis["timings"] = self._get_timings(perf_counter() - start)
+        return analysis
+
+    def _compute_sections(self, sections: List[str]):
+        """Compute and memoize sections, with a single page pass for all that need one."""
+        if any(section in HEADER_SECTIONS for section in sections):
+            header = self.timer.call("header", self._get_header)
+            self._sections.update((section, header[section]) for section in HEADER_SECTIONS)
+
+        page_sections = [section for section in sections if section not in HEADER_SECTIONS]
+        if not page_sections:
+            return
+        collectors = self._make_collectors(page_sections)
+        pages = list(self._iter_pages(collectors, analyze_pages="pages" in page_sections))
+        if "pages" in page_sections:
+            self._sections["pages"] = pages
+        # Dependencies were computed in full too, so keep them
+        self._sections.update(self.timer.call("results", self._collect_results, collectors))
+
+    def iter_analysis(self) -> Iterator[Dict[str, Any]]:
+        """Stream the analysis: one record per page as it is analyzed, then a document summary.
+
+        Page records are not kept, so memory stays flat regardless of page count.
+        """
+        with capture_profile(self.profile, self.profile_dir / self.filename):
+            start = perf_counter()
+            collectors = self._make_collectors()
+            for page_info in self._iter_pages(collectors):
+                yield {"record": "page", "filename": self.filename, **page_info}
+
+            summary = {"record": "document", **self.timer.call("header", self._get_header)}
+            summary.update(self.timer.call("results", self._collect_results, collectors))
+            if self.timings:
+                summary["timings"] = self._get_timings(perf_counter() - start)
+        yield summary
+
+    def classify_rendering(self, confidence: float = DEFAULT_CLASSIFY_CONFIDENCE,
+                           min_prevalence: float = DEFAULT_MIN_PREVALENCE,
+                           max_pages: Optional[int] = None) -> Dict[str, Any]:
+        """Fast rendering_approach estimate from a stratified random sample of pages.
+
+        Pages are sampled until the label reaches the requested confidence
+        (or max_pages or the whole document is read). Each signal stops being
+        extracted once it is seen. With every page read, the label and the
+        confidence of 1.0 match the full analysis.
+        """
+        start = perf_counter()
+        page_count = self.doc.page_count
+        call = self.timer.call
+        sampled = with_images = 0
+        has_text = has_embedded_fonts = False
+        label, label_confidence = _rendering_label(0, False, False), 1.0 if page_count == 0 else 0.0
+        for page_num in _stratified_order(page_count)[:max_pages]:
+            page = call("load_page", self.doc.load_page, page_num)
+            sampled += 1
+            if call("get_images", page.get_images):
+                with_images += 1
+            if not has_text:
+                has_text = len(call("get_text", page.get_text)) > 10
+            if not has_embedded_fonts:
+                has_embedded_fonts = any(font[1] != "n/a" for font in call("get_fonts", page.get_fonts))
+
+            image_ratio = with_images / sampled
+            label = _rendering_label(image_ratio, has_text, has_embedded_fonts)
+            label_confidence = _ratio_side_confidence(with_images, sampled, page_count, RASTER_PAGE_RATIO)
+            # The label also rests on whichever presence signals were not seen
+            if not has_text:
+                label_confidence *= _absence_confidence(sampled, page_count, min_prevalence)
+            elif image_ratio <= RASTER_PAGE_RATIO and not has_embedded_fonts:
+                label_confidence *= _absence_confidence(sampled, page_count, min_prevalence)
+            if label_confidence >= confidence:
+                break
+
+        result = {
+            "filename": self.filename,
+            "rendering_approach": label,
+            "confidence": round(label_confidence, 4),
+            "pages_sampled": sampled,
+            "page_count": page_count,
+        }
+        if self.timings:
+            result["timings"] = self._get_timings(perf_counter() - start)
+        return result
+
+    def _get_timings(self, total_seconds: float) -> Dict[str, Any]:
+        """Elapsed time, calls and returned items (fonts, blocks, drawings...) per section.
+
+        With page_workers > 1, section seconds are summed across the workers.
+        """
+        return {
+            "total_seconds": round(total_seconds, 6),
+            "xref_objects": self.doc.xref_length(),
+            "sections": self.timer.result(),
+        }
+
+    def _get_header(self) -> Dict[str, Any]:
+        """Document-level fields that do not require a page pass."""
+        return {
             "filename": self.filename,
             "metadata": self._get_metadata(),
             "document_info": self._get_document_info(),
-            "pages": [],
-            "fonts": self._analyze_fonts(),
-            "images": self._analyze_images(),
-            "form_fields": self._analyze_forms(),
-            "text_extraction": self._analyze_text_extraction(),
-            "rendering_approach": self._determine_rendering_approach(),
         }
-        
-        # Analyze each page
-        for page_num, page in enumerate(self.doc):
-            page_analysis = self._analyze_page(page, page_num)
-            analysis["pages"].append(page_analysis)
-            
-        return analysis
+
+    def _make_collectors(self, sections=COLLECTOR_SECTIONS) -> Dict[str, Any]:
+        """Collectors for the given sections and the sections they depend on, in output order."""
+        wanted = set(sections)
+        for section in sections:
+            wanted.update(SECTION_DEPENDENCIES.get(section, ()))
+        fonts = FontCollector()
+        collectors = {
+            "fonts": lambda: fonts,
+            "images": lambda: ImageCollector(self.deep_images),
+            "form_fields": lambda: FormCollector(self.doc.is_form_pdf),
+            "text_extraction": TextCollector,
+            "rendering_approach": lambda: RenderingCollector(fonts),
+            "resources": lambda: ResourceCollector(fonts),
+        }
+        return {section: make() for section, make in collectors.items() if section in wanted}
+
+    def _collect_results(self, collectors: Dict[str, Any]) -> Dict[str, Any]:
+        return {section: collector.result() for section, collector in collectors.items()}
+
+    def _iter_pages(self, collectors: Dict[str, Any], start: int = 0,
+                    stop: Optional[int] = None, analyze_pages: bool = True) -> Iterator[Dict]:
+        """Feed each page to the collectors and yield its page analysis (none if not analyze_pages)."""
+        if self.page_workers > 1 and not is_buffer(self.pdf_path):
+            yield from self._iter_pages_sharded(collectors, analyze_pages)
+            return
+
+        call = self.timer.call
+        named_collectors = [(f"collect.{section}", collector) for section, collector in collectors.items()]
+        for page_data in self._iter_page_data(start, stop):
+            for name, collector in named_collectors:
+                call(name, collector.add, page_data)
+            if not analyze_pages:
+                continue
+            page_info = call("analyze_page", self._analyze_page, page_data)
+            if self.timings:
+                page_info["seconds"] = round(perf_counter() - page_data["started"], 6)
+            yield page_info
+
+    def _iter_pages_sharded(self, collectors: Dict[str, Any], analyze_pages: bool = True) -> Iterator[Dict]:
+        """Analyze page ranges in worker processes and merge their collectors in page order."""
+        page_count = self.doc.page_count
+        shard_size = max(1, math.ceil(page_count / self.page_workers))
+        starts = list(range(0, page_count, shard_size))
+        stops = [min(start + shard_size, page_count) for start in starts]
+        options = {
+            "deep_images": self.deep_images,
+            "window_size": self.window_size,
+            "memory_limit_mb": self.memory_limit_mb,
+            "timings": self.timings,
+        }
+
+        sections = list(collectors) + (["pages"] if analyze_pages else [])
+
+        with ProcessPoolExecutor(max_workers=self.page_workers) as executor:
+            shards = executor.map(_analyze_page_range, [self.pdf_path] * len(starts),
+                                  starts, stops, [options] * len(starts), [sections] * len(starts))
+            for pages, shard_collectors, shard_timer in shards:
+                for section, collector in collectors.items():
+                    collector.merge(shard_collectors[section])
+                self.timer.merge(shard_timer)
+                yield from pages
+
+    def _window_full(self, pages_in_window: int) -> bool:
+        """Whether to release resources before loading the next page."""
+        if self.window_size and pages_in_window >= self.window_size:
+            return True
+        if self.memory_limit_mb and pages_in_window >= MIN_WINDOW_PAGES:
+            rss = _current_rss_bytes()
+            return rss is not None and rss > self.memory_limit_mb * 1024 * 1024
+        return False
+
+    def _release_resources(self):
+        """Drop cached page resources and reopen the document to reset its object cache."""
+        self.doc.close()
+        gc.collect()
+        fitz.TOOLS.store_shrink(100)
+        self.doc = self.timer.call("open", open_pdf, self.pdf_path)
+
+    def _page_extractors(self) -> Dict[str, Any]:
+        """PageData key -> (timer section, extraction function)."""
+        is_form_pdf = self.doc.is_form_pdf
+        return {
+            "fonts": ("get_fonts", lambda data: data["page"].get_fonts()),
+            "images": ("get_images", lambda data: data["page"].get_images()),
+            "xobjects": ("get_xobjects", lambda data: data["page"].get_xobjects()),
+            "blocks": ("get_text_blocks", lambda data: data["page"].get_text("blocks")),
+            "drawings": ("get_drawings", lambda data: data["page"].get_drawings()),
+            "widgets": ("get_widgets", lambda data: self._get_widgets(data["page"]) if is_form_pdf else []),
+            "text": ("get_text", lambda data: data["page"].get_text()),
+            "text_dict": ("get_text_dict", lambda data: data["page"].get_text("dict")
+                          if data["page_num"] < TEXT_SAMPLE_PAGES else {}),
+            "image_info": ("get_image_info", lambda data: data["page"].get_image_info()),
+            # Reuses the full dict on sampled pages (time of a first text_dict extraction included)
+            "span_boxes": ("get_span_boxes", lambda data: self._get_span_boxes(
+                data["text_dict"] or data["page"].get_text("dict", flags=SPAN_TEXT_FLAGS))),
+        }
+
+    def _iter_page_data(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict]:
+        """Load each page once; its data is extracted lazily, as the collectors read it."""
+        extractors = self._page_extractors()
+        stop = self.doc.page_count if stop is None else min(stop, self.doc.page_count)
+        windowed = self.window_size or self.memory_limit_mb
+        window_start = start
+        call = self.timer.call
+        for page_num in range(start, stop):
+            started = perf_counter() if self.timings else None
+            if windowed and self._window_full(page_num - window_start):
+                call("release_resources", self._release_resources)
+                window_start = page_num
+            page = call("load_page", self.doc.load_page, page_num)
+            page_data = PageData(page, page_num, extractors, self.timer, started)
+            yield page_data
+            del page, page_data
+
+    def _get_span_boxes(self, text_dict: Dict) -> List:
+        """Bounding boxes of the non-blank text spans in a get_text("dict") result."""
+        return [
+            span["bbox"]
+            for block in text_dict.get("blocks", []) if block.get("type") == 0
+            for line in block["lines"]
+            for span in line["spans"] if span["text"].strip()
+        ]
+
+    def _get_widgets(self, page) -> List[Dict]:
+        """Extract form field info for the widgets on a page."""
+        return [
+            {
+                "field_name": widget.field_name,
+                "field_type": widget.field_type,
+                "field_value": widget.field_value,
+                "page": page.number
+            }
+            for widget in page.widgets()
+        ]
     
     def _get_metadata(self) -> Dict:
         """Extract PDF metadata."""
@@ -61,209 +848,106 @@ class PDFAnalyzer:
             "is_reflowable": self.doc.is_reflowable,
             "is_repaired": self.doc.is_repaired,
             "pdf_version": getattr(self.doc, 'pdf_version', 'unknown'),
-            "file_size": Path(self.pdf_path).stat().st_size,
-        }
-    
-    def _analyze_fonts(self) -> Dict:
-        """Analyze fonts used in the document."""
-        fonts = {}
-        for page in self.doc:
-            for font in page.get_fonts():
-                font_name = font[3]  # Font name
-                if font_name not in fonts:
-                    fonts[font_name] = {
-                        "name": font_name,
-                        "type": font[0],  # Font type
-                        "encoding": font[2],  # Encoding
-                        "pages_used": [],
-                        "is_embedded": "+" in font_name,  # Embedded fonts often have + prefix
-                    }
-                fonts[font_name]["pages_used"].append(page.number)
-        
-        return fonts
-    
-    def _analyze_images(self) -> Dict:
-        """Analyze images in the document."""
-        images_info = {
-            "total_count": 0,
-            "by_page": {},
-            "formats": set(),
-        }
-        
-        for page_num, page in enumerate(self.doc):
-            image_list = page.get_images()
-            if image_list:
-                images_info["by_page"][page_num] = len(image_list)
-                images_info["total_count"] += len(image_list)
-                
-                for img in image_list:
-                    try:
-                        xref = img[0]
-                        pix = fitz.Pixmap(self.doc, xref)
-                        images_info["formats"].add(pix.colorspace.name if pix.colorspace else "unknown")
-                        pix = None
-                    except:
-                        images_info["formats"].add("unknown")
-        
-        images_info["formats"] = list(images_info["formats"])
-        return images_info
-    
-    def _analyze_forms(self) -> Dict:
-        """Analyze form fields if present."""
-        forms_info = {
-            "has_forms": self.doc.is_form_pdf,
-            "field_count": 0,
-            "field_types": [],
-            "fields": []
-        }
-        
-        if self.doc.is_form_pdf:
-            for page in self.doc:
-                widgets = page.widgets()
-                for widget in widgets:
-                    forms_info["field_count"] += 1
-                    field_info = {
-                        "field_name": widget.field_name,
-                        "field_type": widget.field_type,
-                        "field_value": widget.field_value,
-                        "page": page.number
-                    }
-                    forms_info["fields"].append(field_info)
-                    if widget.field_type not in forms_info["field_types"]:
-                        forms_info["field_types"].append(widget.field_type)
-        
-        return forms_info
-    
-    def _analyze_text_extraction(self) -> Dict:
-        """Analyze how text is stored and can be extracted."""
-        text_info = {
-            "extraction_methods": {},
-            "total_characters": 0,
-            "has_searchable_text": False,
-            "text_rendering_mode": None,
+            "file_size": source_size(self.pdf_path),
         }
-        
-        # Try different extraction methods
-        for page in self.doc[:3]:  # Sample first 3 pages
-            # Raw text
-            raw_text = page.get_text()
-            text_info["extraction_methods"]["raw"] = len(raw_text) > 0
-            
-            # Text with layout preservation
-            blocks = page.get_text("blocks")
-            text_info["extraction_methods"]["blocks"] = len(blocks) > 0
-            
-            # Text as dict (detailed)
-            text_dict = page.get_text("dict")
-            text_info["extraction_methods"]["dict"] = len(text_dict.get("blocks", [])) > 0
-            
-            text_info["total_characters"] += len(raw_text)
-            if len(raw_text) > 10:
-                text_info["has_searchable_text"] = True
-        
-        return text_info
     
-    def _analyze_page(self, page, page_num: int) -> Dict:
+    def _analyze_page(self, page_data: Dict) -> Dict:
         """Detailed analysis of a single page."""
-        # Get text blocks with positions
-        blocks = page.get_text("blocks")
-        
-        # Get drawings/vectors
-        drawings = page.get_drawings()
+        page = page_data["page"]
+        blocks = page_data["blocks"]
+        image_boxes = [info["bbox"] for info in page_data["image_info"]]
+        coverage = page_coverage(
+            page.rect,
+            boxes_to_array(page_data["span_boxes"]),
+            boxes_to_array(image_boxes),
+            boxes_to_array(drawing["rect"] for drawing in page_data["drawings"]),
+        )
         
         page_info = {
-            "page_number": page_num,
+            "page_number": page_data["page_num"],
             "width": page.rect.width,
             "height": page.rect.height,
             "rotation": page.rotation,
             "text_blocks": len(blocks),
-            "drawing_commands": len(drawings),
-            "has_images": len(page.get_images()) > 0,
-            "text_coverage": self._calculate_text_coverage(page, blocks),
-            "is_scanned": self._is_likely_scanned(page, blocks),
+            "drawing_commands": len(page_data["drawings"]),
+            "has_images": len(page_data["images"]) > 0,
+            **coverage,
+            "is_scanned": self._is_likely_scanned(page, image_boxes, blocks),
         }
         
         return page_info
     
-    def _calculate_text_coverage(self, page, blocks) -> float:
-        """Calculate percentage of page covered by text."""
-        if not blocks:
-            return 0.0
-        
-        text_area = 0
-        for block in blocks:
-            if block[6] == 0:  # Text block (not image)
-                x0, y0, x1, y1 = block[:4]
-                text_area += (x1 - x0) * (y1 - y0)
-        
-        page_area = page.rect.width * page.rect.height
-        return (text_area / page_area) * 100 if page_area > 0 else 0
-    
-    def _is_likely_scanned(self, page, blocks) -> bool:
+    def _is_likely_scanned(self, page, image_boxes, blocks) -> bool:
         """Determine if page is likely a scanned image."""
         # If page has one large image and no/little text, likely scanned
-        images = page.get_images()
-        has_full_page_image = False
-        
-        if images:
-            for img in images:
-                try:
-                    # Check if image covers most of the page
-                    img_rect = page.get_image_bbox(img)
-                    if img_rect:
-                        img_area = img_rect.width * img_rect.height
-                        page_area = page.rect.width * page.rect.height
-                        if img_area / page_area > 0.8:
-                            has_full_page_image = True
-                            break
-                except:
-                    continue
+        page_area = page.rect.width * page.rect.height
+        has_full_page_image = any(
+            page_area > 0 and fitz.Rect(bbox).get_area() / page_area > 0.8
+            for bbox in image_boxes
+        )
         
         # Little to no text blocks suggests scanned
         has_minimal_text = len(blocks) < 3
         
         return has_full_page_image and has_minimal_text
     
-    def _determine_rendering_approach(self) -> str:
-        """Determine the likely approach used for PDF creation/translation."""
-        # Analyze characteristics to determine approach
-        
-        # Check for rasterization
-        total_pages = self.doc.page_count
-        pages_with_images = sum(1 for p in self.doc if p.get_images())
-        image_ratio = pages_with_images / total_pages if total_pages > 0 else 0
-        
-        # Check text preservation
-        has_text = any(len(p.get_text()) > 10 for p in self.doc)
-        
-        # Check fonts
-        fonts = self._analyze_fonts()
-        embedded_fonts = sum(1 for f in fonts.values() if f["is_embedded"])
-        
-        # Determine approach
-        if image_ratio > 0.8 and not has_text:
-            return "FULL_RASTERIZATION"
-        elif image_ratio > 0.8 and has_text:
-            return "IMAGE_WITH_OCR_OVERLAY"
-        elif embedded_fonts > 0 and has_text:
-            return "TEXT_REPLACEMENT_WITH_EMBEDDING"
-        elif has_text:
-            return "TEXT_REPLACEMENT_NATIVE"
-        else:
-            return "UNKNOWN"
-    
     def close(self):
-        """Close the PDF document."""
+        """Close the PDF document (and release the view of a buffer source, so an mmap can be closed)."""
         self.doc.close()
+        if self._owns_view:
+            self.pdf_path.release()
 
 
-def compare_files(original_path: str, translated_path: str) -> Dict:
-    """Compare original and translated PDFs to understand translation approach."""
-    orig_analyzer = PDFAnalyzer(original_path)
-    trans_analyzer = PDFAnalyzer(translated_path)
-    
-    orig_analysis = orig_analyzer.analyze_structure()
-    trans_analysis = trans_analyzer.analyze_structure()
+def analyze_file(pdf_path, cache: Optional[AnalysisCache] = None, sections=None,
+                 filename: Optional[str] = None, **analyzer_options) -> Dict[str, Any]:
+    """Analyze a PDF path or buffer, reusing a cached result when the content is unchanged.
+
+    With sections, only those are returned; a cached full analysis answers
+    them, but a partial analysis is not stored.
+    """
+    key = None
+    if any(analyzer_options.get(name) for name in MEASUREMENT_OPTIONS):
+        cache = None
+    if cache is not None:
+        # Options that change the output get their own cache entries
+        variant = "".join(f"-{name}" for name, value in sorted(analyzer_options.items())
+                          if value and name in OUTPUT_OPTIONS)
+        key = cache.key_for(pdf_path, variant)
+        analysis = cache.get(key)
+        if analysis is not None:
+            # Identical bytes may be stored under another name
+            analysis["filename"] = filename or source_name(pdf_path)
+            if sections is not None:
+                analysis = {name: value for name, value in analysis.items()
+                            if name == "filename" or name in sections}
+            return analysis
+
+    analyzer = PDFAnalyzer(pdf_path, filename=filename, **analyzer_options)
+    try:
+        analysis = analyzer.analyze(sections)
+    finally:
+        analyzer.close()
+
+    if cache is not None and sections is None:
+        cache.put(key, analysis)
+    return analysis
+
+
+def compare_files(original_path, translated_path,
+                  cache: Optional[AnalysisCache] = None, layout: bool = False,
+                  original_name: Optional[str] = None, translated_name: Optional[str] = None,
+                  visual: bool = False, visual_dpi: int = DEFAULT_VISUAL_DPI, visual_workers: Optional[int] = None,
+                  thumbnail_dir=DEFAULT_THUMBNAIL_DIR, thumbnail_max_bytes: int = DEFAULT_THUMBNAIL_MAX_BYTES,
+                  **analyzer_options) -> Dict:
+    """Compare original and translated PDFs to understand translation approach.
+
+    Either side may be a path or an in-memory buffer; *_name names a buffer in the output.
+    With layout=True the comparison also carries a block-level layout-fidelity diff,
+    and with visual=True a rendered-page diff (SSIM, changed regions, perceptual hashes)
+    whose renders are cached in thumbnail_dir (None: not cached).
+    """
+    orig_analysis = analyze_file(original_path, cache, filename=original_name, **analyzer_options)
+    trans_analysis = analyze_file(translated_path, cache, filename=translated_name, **analyzer_options)
     
     comparison = {
         "original": orig_analysis,
@@ -277,33 +961,254 @@ def compare_files(original_path: str, translated_path: str) -> Dict:
             "producer_software": trans_analysis["metadata"]["producer"],
         }
     }
-    
-    orig_analyzer.close()
-    trans_analyzer.close()
+
+    if layout:
+        comparison["layout_fidelity"] = diff_layout(original_path, translated_path)
+    if visual:
+        comparison["visual_fidelity"] = diff_visual(original_path, translated_path, visual_dpi, visual_workers,
+                                                    thumbnail_dir, thumbnail_max_bytes)
     
     return comparison
 
 
+def parse_translated_name(filename: str) -> Optional[Dict[str, str]]:
+    """Split <category>.<src-lang>.<filename>.<dst-lang>.<provider>.pdf into its parts."""
+    parts = Path(filename).name.split(".")
+    if len(parts) < 6 or parts[-1] != "pdf":
+        return None
+    return {
+        "category": parts[0],
+        "source_lang": parts[1],
+        "name": ".".join(parts[2:-3]),
+        "target_lang": parts[-3],
+        "provider": parts[-2],
+        "original": ".".join(parts[:-3]) + ".pdf",
+    }
+
+
+def document_labels(filename: str) -> Dict[str, str]:
+    """Role, provider, category and language of a corpus file, from its name."""
+    info = parse_translated_name(filename)
+    if info:
+        return {"role": "translated", "provider": info["provider"], "category": info["category"],
+                "language": info["target_lang"]}
+    parts = Path(filename).name.split(".")
+    return {"role": "original", "provider": "", "category": parts[0] if len(parts) >= 4 else "",
+            "language": parts[1] if len(parts) >= 4 else ""}
+
+
+def find_corpus_pairs(originals_dir: Path = ORIGINALS_DIR,
+                      translated_dir: Path = TRANSLATED_DIR) -> List[Dict[str, str]]:
+    """Pair every translated/<provider>/ file with its source in originals/."""
+    pairs = []
+    for translated_path in sorted(Path(translated_dir).glob("*/*.pdf")):
+        info = parse_translated_name(translated_path.name)
+        if not info:
+            print(f"Skipping {translated_path}: name does not follow the naming convention", file=sys.stderr)
+            continue
+        if info["provider"] != translated_path.parent.name:
+            print(f"Skipping {translated_path}: provider does not match its folder", file=sys.stderr)
+            continue
+        original_path = Path(originals_dir) / info["original"]
+        if not original_path.exists():
+            print(f"Skipping {translated_path}: no original {info['original']}", file=sys.stderr)
+            continue
+        info["original"] = str(original_path)
+        info["translated"] = str(translated_path)
+        pairs.append(info)
+    return pairs
+
+
+def _make_cache(cache_dir, max_bytes: int) -> Optional[AnalysisCache]:
+    """Open the analysis cache, or return None when caching is disabled."""
+    if cache_dir is None:
+        return None
+    return AnalysisCache(ANALYZER_VERSION, cache_dir, max_bytes)
+
+
+def _compare_pair(pair: Dict[str, str], cache_dir=None, cache_max_bytes: int = DEFAULT_MAX_BYTES,
+                  analyzer_options: Optional[Dict] = None, layout: bool = False, visual: bool = False,
+                  visual_dpi: int = DEFAULT_VISUAL_DPI, thumbnail_dir=DEFAULT_THUMBNAIL_DIR) -> Dict:
+    """Process pool job: compare one original/translated pair.
+
+    The visual diff renders in this process, since pairs already run in parallel.
+    """
+    record = dict(pair)
+    try:
+        cache = _make_cache(cache_dir, cache_max_bytes)
+        record["comparison"] = compare_files(pair["original"], pair["translated"], cache, layout,
+                                             visual=visual, visual_dpi=visual_dpi, visual_workers=1,
+                                             thumbnail_dir=thumbnail_dir, **(analyzer_options or {}))
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    return record
+
+
+def analyze_corpus(pairs: List[Dict[str, str]], workers: Optional[int] = None,
+                   cache_dir=None, cache_max_bytes: int = DEFAULT_MAX_BYTES,
+                   analyzer_options: Optional[Dict] = None, layout: bool = False, visual: bool = False,
+                   visual_dpi: int = DEFAULT_VISUAL_DPI, thumbnail_dir=DEFAULT_THUMBNAIL_DIR) -> Iterator[Dict]:
+    """Run compare_files over all pairs in a process pool, yielding records as they finish."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for pair in pairs:
+            yield _compare_pair(pair, cache_dir, cache_max_bytes, analyzer_options, layout, visual, visual_dpi,
+                                thumbnail_dir)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_compare_pair, pair, cache_dir, cache_max_bytes,
+                                   analyzer_options, layout, visual, visual_dpi, thumbnail_dir) for pair in pairs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _parse_sections(value: str) -> List[str]:
+    """argparse type for --sections."""
+    sections = [section.strip() for section in value.split(",") if section.strip()]
+    unknown = set(sections).difference(SECTIONS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown sections {', '.join(sorted(unknown))} "
+                                         f"(choose from {', '.join(SECTIONS)})")
+    return sections
+
+
+def _analyzer_options(args) -> Dict[str, Any]:
+    """PDFAnalyzer keyword arguments selected on the command line."""
+    return {
+        "deep_images": args.deep_images,
+        "window_size": args.window,
+        "memory_limit_mb": args.max_memory,
+        "page_workers": args.page_workers,
+        "timings": args.timings,
+        "profile": args.profile,
+        "profile_dir": args.profile_dir,
+    }
+
+
+def run_batch(args) -> int:
+    """Batch mode: compare the whole corpus and write one JSONL result set."""
+    pairs = find_corpus_pairs(args.originals, args.translated)
+    if args.provider:
+        pairs = [p for p in pairs if p["provider"] in args.provider]
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    failed = 0
+    try:
+        for record in analyze_corpus(pairs, args.workers, args.cache_dir, args.cache_max_bytes,
+                                     _analyzer_options(args), args.layout, args.visual, args.visual_dpi,
+                                     args.thumbnail_dir):
+            if "error" in record:
+                failed += 1
+                print(f"Error comparing {record['translated']}: {record['error']}", file=sys.stderr)
+            out.write(json.dumps(record, default=str) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Compared {len(pairs) - failed}/{len(pairs)} pairs", file=sys.stderr)
+    return 1 if failed else 0
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python analyze_pdf_structure.py <pdf_file> [translated_file]")
+    parser = argparse.ArgumentParser(description="Analyze PDF structure and translation approach")
+    parser.add_argument('pdf_file', nargs='?', help='PDF to analyze (the original in compare mode)')
+    parser.add_argument('translated_file', nargs='?', help='Translated PDF to compare against pdf_file')
+    parser.add_argument('--batch', action='store_true',
+                        help='Compare every translated/<provider>/ file with its original (JSONL output)')
+    parser.add_argument('--originals', type=Path, default=ORIGINALS_DIR, help='Originals directory for --batch')
+    parser.add_argument('--translated', type=Path, default=TRANSLATED_DIR, help='Translated directory for --batch')
+    parser.add_argument('--provider', action='append', help='Restrict --batch to a provider (repeatable)')
+    parser.add_argument('--workers', type=int, help='Worker processes for --batch (default: CPU count)')
+    parser.add_argument('--output', '-o', help='Write --batch results to this file instead of stdout')
+    parser.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR,
+                        help='Analysis cache directory for compare and --batch modes')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='Maximum analysis cache size in MB (least recently used entries are evicted)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always re-analyze and re-render instead of using the analysis and thumbnail caches')
+    parser.add_argument('--thumbnail-dir', type=Path, default=DEFAULT_THUMBNAIL_DIR,
+                        help='Where --visual caches its page renders')
+    parser.add_argument('--layout', action='store_true',
+                        help='Add a block-level layout-fidelity diff to compare and --batch results')
+    parser.add_argument('--visual', action='store_true',
+                        help='Add a rendered-page visual diff (SSIM, changed regions, perceptual hashes)')
+    parser.add_argument('--visual-dpi', type=int, default=DEFAULT_VISUAL_DPI,
+                        help='Render resolution for --visual')
+    parser.add_argument('--jsonl', action='store_true',
+                        help='Stream single-file analysis as JSONL: one record per page, then a document summary')
+    parser.add_argument('--window', type=int,
+                        help='Reopen the document every N pages to bound memory on very large PDFs')
+    parser.add_argument('--max-memory', type=int,
+                        help='Release page resources and reopen the document whenever RSS exceeds this many MB')
+    parser.add_argument('--page-workers', type=int, default=1,
+                        help='Shard the pages of each document across this many worker processes')
+    parser.add_argument('--deep-images', action='store_true',
+                        help='Decode every unique image to inspect its colorspace (slow on scanned PDFs)')
+    parser.add_argument('--classify', action='store_true',
+                        help='Only estimate rendering_approach from sampled pages (one JSON line per file)')
+    parser.add_argument('--confidence', type=float, default=DEFAULT_CLASSIFY_CONFIDENCE,
+                        help='Confidence at which --classify stops sampling pages')
+    parser.add_argument('--min-prevalence', type=float, default=DEFAULT_MIN_PREVALENCE,
+                        help='Smallest share of pages text or embedded fonts are assumed to cover when present')
+    parser.add_argument('--sections', type=_parse_sections,
+                        help=f'Comma-separated sections to compute for a single file ({",".join(SECTIONS)})')
+    parser.add_argument('--timings', action='store_true',
+                        help='Add per-section elapsed time, call and object counts as a "timings" block')
+    parser.add_argument('--profile', choices=PROFILE_MODES,
+                        help='Write a cProfile or tracemalloc profile per document (main process only)')
+    parser.add_argument('--profile-dir', type=Path, default=DEFAULT_PROFILE_DIR,
+                        help='Where --profile writes <filename>.prof / <filename>.tracemalloc.txt')
+
+    args = parser.parse_args()
+    if args.no_cache:
+        args.cache_dir = None
+        args.thumbnail_dir = None
+    args.cache_max_bytes = args.cache_size * 1024 * 1024
+
+    if args.batch:
+        sys.exit(run_batch(args))
+
+    if not args.pdf_file:
+        parser.print_usage()
         sys.exit(1)
+
+    pdf_path = args.pdf_file
+
+    if args.classify:
+        for path in filter(None, (pdf_path, args.translated_file)):
+            analyzer = PDFAnalyzer(path, **_analyzer_options(args))
+            try:
+                print(json.dumps(analyzer.classify_rendering(args.confidence, args.min_prevalence)))
+            finally:
+                analyzer.close()
+        return
     
-    pdf_path = sys.argv[1]
-    
-    if len(sys.argv) > 2:
+    if args.translated_file:
         # Compare mode
-        translated_path = sys.argv[2]
-        comparison = compare_files(pdf_path, translated_path)
+        translated_path = args.translated_file
+        cache = _make_cache(args.cache_dir, args.cache_max_bytes)
+        comparison = compare_files(pdf_path, translated_path, cache, args.layout, visual=args.visual,
+                                   visual_dpi=args.visual_dpi, thumbnail_dir=args.thumbnail_dir,
+                                   **_analyzer_options(args))
         print(json.dumps(comparison, indent=2, default=str))
     else:
         # Single file analysis
-        analyzer = PDFAnalyzer(pdf_path)
-        analysis = analyzer.analyze_structure()
+        analyzer = PDFAnalyzer(pdf_path, **_analyzer_options(args))
+        if args.jsonl:
+            try:
+                for record in analyzer.iter_analysis():
+                    print(json.dumps(record, default=str), flush=True)
+            finally:
+                analyzer.close()
+            return
+
+        analysis = analyzer.analyze(args.sections)
         analyzer.close()
         
         print(json.dumps(analysis, indent=2, default=str))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
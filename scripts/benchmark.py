@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness over the committed sample corpus.
+Times PDFAnalyzer.analyze_structure on every PDF in originals/ and translated/*,
+compare_files on every translated/original pair, and the pseudolocale generator
+on every original. Records wall time, per-file and per-analyzer-step time (from
+PDFAnalyzer timings), peak RSS and pages/sec, and fails when a run regresses
+against the stored baseline. Runs fully offline.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import fitz  # PyMuPDF
+
+from analyze_pdf_structure import (ORIGINALS_DIR, TRANSLATED_DIR, PDFAnalyzer, compare_files,
+                                   find_corpus_pairs)
+from make_pseudolocale import PROFILES, generate
+
+REPO_ROOT = Path(__file__).parent.parent
+BENCHMARK_DIR = REPO_ROOT / "analysis" / "benchmarks"
+BASELINE_FILE = BENCHMARK_DIR / "baseline.json"
+
+# Bump when the layout of the results file changes
+RESULTS_VERSION = 1
+
+SECTIONS = ("analyze_structure", "compare_files", "pseudolocale")
+
+# A section regresses when it is slower (or larger) than the baseline by this share...
+DEFAULT_TIME_THRESHOLD = 0.25
+DEFAULT_RSS_THRESHOLD = 0.25
+# ...and by more than these absolute amounts, so timer noise on fast sections is ignored
+MIN_TIME_DELTA = 0.5
+MIN_RSS_DELTA_MB = 16.0
+
+
+def _page_count(pdf_path) -> int:
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def _peak_rss_mb() -> float:
+    """Peak RSS of this process or any of its finished children, in MB (ru_maxrss is KB on Linux)."""
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _bench_analyze_structure(originals_dir: Path, translated_dir: Path) -> Dict:
+    files = {}
+    steps = {}
+    pages = 0
+    paths = sorted(Path(originals_dir).glob("*.pdf")) + sorted(Path(translated_dir).glob("*/*.pdf"))
+    for pdf_path in paths:
+        start = time.perf_counter()
+        analyzer = PDFAnalyzer(str(pdf_path), timings=True)
+        try:
+            analysis = analyzer.analyze_structure()
+        finally:
+            analyzer.close()
+        files[str(pdf_path.relative_to(REPO_ROOT))] = time.perf_counter() - start
+        pages += analysis["document_info"]["page_count"]
+        for step, timing in analysis["timings"]["sections"].items():
+            steps[step] = steps.get(step, 0.0) + timing["seconds"]
+    return {"files": files, "pages": pages, "steps": steps}
+
+
+def _bench_compare_files(originals_dir: Path, translated_dir: Path) -> Dict:
+    files = {}
+    pages = 0
+    for pair in find_corpus_pairs(originals_dir, translated_dir):
+        start = time.perf_counter()
+        comparison = compare_files(pair["original"], pair["translated"], layout=True)
+        files[str(Path(pair["translated"]).relative_to(REPO_ROOT))] = time.perf_counter() - start
+        pages += (comparison["original"]["document_info"]["page_count"]
+                  + comparison["translated"]["document_info"]["page_count"])
+    return {"files": files, "pages": pages}
+
+
+def _bench_pseudolocale(originals_dir: Path, translated_dir: Path) -> Dict:
+    sources = sorted(Path(originals_dir).glob("*.pdf"))
+    output_dir = Path(tempfile.mkdtemp(prefix="psgen-bench-"))
+    timings = {}
+    try:
+        # One worker, so the time is comparable across machines with different core counts
+        generate(sources, list(PROFILES), output_dir, workers=1, timings=timings)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    files = {Path(dest).name: seconds for dest, seconds in timings.items()}
+    return {"files": files, "pages": sum(_page_count(source) for source in sources) * len(PROFILES)}
+
+
+SECTION_RUNNERS = {
+    "analyze_structure": _bench_analyze_structure,
+    "compare_files": _bench_compare_files,
+    "pseudolocale": _bench_pseudolocale,
+}
+
+
+def _run_section(section: str, originals_dir: str, translated_dir: str) -> Dict:
+    """Child process job: run one section and measure it (a fresh process, so peak RSS is its own)."""
+    start = time.perf_counter()
+    result = SECTION_RUNNERS[section](Path(originals_dir), Path(translated_dir))
+    wall_time = time.perf_counter() - start
+    return {
+        "wall_time": round(wall_time, 3),
+        "pages": result["pages"],
+        "pages_per_sec": round(result["pages"] / wall_time, 2) if wall_time else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "files": {name: round(seconds, 3) for name, seconds in result["files"].items()},
+        "steps": {name: round(seconds, 3) for name, seconds in result.get("steps", {}).items()},
+    }
+
+
+def run_benchmarks(sections: List[str], repeat: int = 1, originals_dir: Path = ORIGINALS_DIR,
+                   translated_dir: Path = TRANSLATED_DIR) -> Dict:
+    """Run each section repeat times in a fresh process and keep its fastest run."""
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for section in sections:
+        runs = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                runs.append(executor.submit(_run_section, section, str(originals_dir),
+                                            str(translated_dir)).result())
+        best = min(runs, key=lambda run: run["wall_time"])
+        best["runs"] = [run["wall_time"] for run in runs]
+        results[section] = best
+        print(f"{section}: {best['wall_time']:.2f}s, {best['pages_per_sec']} pages/s, "
+              f"peak {best['peak_rss_mb']} MB", file=sys.stderr)
+
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "pymupdf": fitz.VersionBind,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "sections": results,
+    }
+
+
+def find_regressions(results: Dict, baseline: Dict, time_threshold: float = DEFAULT_TIME_THRESHOLD,
+                     rss_threshold: float = DEFAULT_RSS_THRESHOLD) -> List[str]:
+    """Describe every section that got slower or larger than the baseline allows."""
+    regressions = []
+    for section, current in results["sections"].items():
+        previous = baseline["sections"].get(section)
+        if not previous:
+            continue
+        for metric, threshold, min_delta, unit in (("wall_time", time_threshold, MIN_TIME_DELTA, "s"),
+                                                   ("peak_rss_mb", rss_threshold, MIN_RSS_DELTA_MB, " MB")):
+            before, after = previous[metric], current[metric]
+            if after > before * (1 + threshold) and after - before > min_delta:
+                regressions.append(f"{section} {metric}: {before}{unit} -> {after}{unit} "
+                                   f"(+{100 * (after / before - 1):.0f}%, threshold {100 * threshold:.0f}%)")
+    return regressions
+
+
+def _load_results(path: Path) -> Optional[Dict]:
+    try:
+        with open(path, "r") as f:
+            results = json.load(f)
+    except FileNotFoundError:
+        return None
+    if results.get("version") != RESULTS_VERSION:
+        print(f"Ignoring {path}: results version {results.get('version')}, expected {RESULTS_VERSION}",
+              file=sys.stderr)
+        return None
+    return results
+
+
+def _write_results(path: Path, results: Dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analyzer and generators on the sample corpus")
+    parser.add_argument('--section', action='append', choices=SECTIONS,
+                        help='Section to run (repeatable, default: all)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per section; the fastest is kept')
+    parser.add_argument('--output', '-o', type=Path,
+                        default=BENCHMARK_DIR / f"results-v{RESULTS_VERSION}.json",
+                        help='Where to write the results')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_FILE, help='Baseline results to compare against')
+    parser.add_argument('--update-baseline', action='store_true', help='Store this run as the new baseline')
+    parser.add_argument('--time-threshold', type=float, default=DEFAULT_TIME_THRESHOLD,
+                        help='Allowed wall time growth over the baseline (0.25 = 25%%)')
+    parser.add_argument('--rss-threshold', type=float, default=DEFAULT_RSS_THRESHOLD,
+                        help='Allowed peak RSS growth over the baseline (0.25 = 25%%)')
+
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.section or list(SECTIONS), max(1, args.repeat))
+    _write_results(args.output, results)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.update_baseline:
+        _write_results(args.baseline, results)
+        print(f"Baseline updated: {args.baseline}", file=sys.stderr)
+        return 0
+
+    baseline = _load_results(args.baseline)
+    if baseline is None:
+        print("No baseline to compare against (run with --update-baseline to store one)", file=sys.stderr)
+        return 0
+    if baseline["environment"] != results["environment"]:
+        print("Warning: baseline was recorded in a different environment", file=sys.stderr)
+
+    regressions = find_regressions(results, baseline, args.time_threshold, args.rss_threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
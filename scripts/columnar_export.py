@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Columnar export of analysis results.
+Flattens analyze_structure output for many documents into typed NumPy arrays
+saved to one .npz: a documents table, a pages table with one row per page, and
+fonts, images and form-field tables. Repeated strings (provider, producer, font
+name, colorspace...) are dictionary-encoded as int32 codes plus a dictionary
+array, so a cross-document query is a few vectorized comparisons instead of a
+loop over nested dicts.
+"""
+
+import re
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from analysis_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from analyze_pdf_structure import (ORIGINALS_DIR, TRANSLATED_DIR, PageRanges, _make_cache, analyze_file,
+                                   document_labels)
+from coverage_grid import DENSITY_GRID
+
+REPO_ROOT = Path(__file__).parent.parent
+ANALYSIS_DIR = REPO_ROOT / "analysis"
+
+# Bump when the table layout changes
+COLUMNAR_VERSION = 2
+DEFAULT_OUTPUT = ANALYSIS_DIR / f"corpus-v{COLUMNAR_VERSION}.npz"
+
+# Column dtypes per table, in column order; str columns are dictionary-encoded.
+# Every table but documents has a doc column holding the row of its document.
+TABLES = {
+    "documents": {
+        "filename": str, "role": str, "provider": str, "category": str, "language": str,
+        "producer": str, "creator": str, "pdf_version": str, "rendering_approach": str,
+        "page_count": np.int32, "file_size": np.int64, "is_encrypted": np.bool_, "is_form_pdf": np.bool_,
+        "is_repaired": np.bool_, "total_characters": np.int64, "has_searchable_text": np.bool_,
+        "image_count": np.int32, "field_count": np.int32, "font_count": np.int32,
+    },
+    "pages": {
+        "doc": np.int32, "page_number": np.int32, "width": np.float32, "height": np.float32,
+        "rotation": np.int16, "text_blocks": np.int32, "drawing_commands": np.int32,
+        "has_images": np.bool_, "image_count": np.int32, "text_coverage": np.float32,
+        "image_coverage": np.float32, "drawing_coverage": np.float32, "content_coverage": np.float32,
+        "is_scanned": np.bool_,
+    },
+    # pages_start indexes the flat fonts.pages array; a font's pages are pages_start + range(page_count)
+    "fonts": {
+        "doc": np.int32, "name": str, "xref": np.int32, "type": str, "encoding": str, "is_embedded": np.bool_,
+        "page_count": np.int32, "pages_start": np.int64,
+    },
+    "images": {
+        "doc": np.int32, "xref": np.int32, "width": np.int32, "height": np.int32,
+        "bits_per_component": np.int16, "colorspace": str, "filter": str, "occurrences": np.int32,
+    },
+    "fields": {"doc": np.int32, "page": np.int32, "field_type": np.int16},
+}
+
+# Missing numbers (e.g. coverage metrics absent from older analysis files) are stored as these
+MISSING = {np.float32: np.nan, np.int16: -1, np.int32: -1, np.int64: -1, np.bool_: False}
+
+CONDITION_RE = re.compile(r"^\s*(\w+)\s*(<=|>=|==|!=|<|>)\s*(.*?)\s*$")
+OPERATORS = {
+    "<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+    "==": np.equal, "!=": np.not_equal,
+}
+
+
+def encode_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Dictionary-encode strings: (int32 codes, sorted dictionary)."""
+    dictionary, codes = np.unique(np.array(values, dtype=str), return_inverse=True)
+    return codes.astype(np.int32), dictionary
+
+
+class ColumnarWriter:
+    """Accumulates analyses row by row and converts them to typed column arrays."""
+
+    def __init__(self):
+        self.columns = {table: {name: [] for name in columns} for table, columns in TABLES.items()}
+        self.text_density = []
+        self.font_pages = []
+        self.filenames = set()
+
+    def add(self, analysis: Dict) -> bool:
+        """Add one analyze_structure result; False if its filename was already added."""
+        filename = analysis["filename"]
+        if filename in self.filenames:
+            return False
+        self.filenames.add(filename)
+
+        doc = len(self.columns["documents"]["filename"])
+        metadata = analysis.get("metadata", {})
+        info = analysis.get("document_info", {})
+        text = analysis.get("text_extraction", {})
+        images = analysis.get("images", {})
+        forms = analysis.get("form_fields", {})
+        fonts = analysis.get("fonts", {})
+        self._append("documents", {
+            "filename": filename,
+            **document_labels(filename),
+            "producer": metadata.get("producer", ""),
+            "creator": metadata.get("creator", ""),
+            "pdf_version": str(info.get("pdf_version", "")),
+            "rendering_approach": analysis.get("rendering_approach", ""),
+            "page_count": info.get("page_count"),
+            "file_size": info.get("file_size"),
+            "is_encrypted": info.get("is_encrypted"),
+            "is_form_pdf": info.get("is_form_pdf"),
+            "is_repaired": info.get("is_repaired"),
+            "total_characters": text.get("total_characters"),
+            "has_searchable_text": text.get("has_searchable_text"),
+            "image_count": images.get("total_count"),
+            "field_count": forms.get("field_count"),
+            "font_count": len(fonts),
+        })
+
+        # JSON round-trips turn the integer keys of by_page and by_xref into strings
+        images_by_page = {int(page): count for page, count in images.get("by_page", {}).items()}
+        for page in analysis.get("pages", []):
+            self._append("pages", dict(page, doc=doc, image_count=images_by_page.get(page["page_number"], 0)))
+            density = page.get("text_density")
+            self.text_density.append(density if density is not None else np.full(DENSITY_GRID, np.nan))
+
+        for font in fonts.values():
+            pages = font["pages_used"]
+            if pages and isinstance(pages[0], list):
+                pages = list(PageRanges(pages))  # [start, stop) runs since analyzer version 4
+            if "xref" in font:
+                xref, font_type, encoding = font["xref"], font["type"], font["encoding"]
+            else:
+                # Before analyzer version 5 "type" held the xref and "encoding" the font type
+                xref, font_type, encoding = font["type"], font["encoding"], None
+            self._append("fonts", {
+                "doc": doc, "name": font["name"], "xref": xref, "type": font_type, "encoding": encoding,
+                "is_embedded": font["is_embedded"], "page_count": len(pages), "pages_start": len(self.font_pages),
+            })
+            self.font_pages.extend(pages)
+
+        for xref, image in images.get("by_xref", {}).items():
+            self._append("images", dict(image, doc=doc, xref=int(xref)))
+
+        for field in forms.get("fields", []):
+            self._append("fields", dict(field, doc=doc))
+        return True
+
+    def _append(self, table: str, row: Dict):
+        for name, values in self.columns[table].items():
+            values.append(row.get(name))
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """All tables as "<table>.<column>" arrays, plus "<table>.<column>.dictionary" for str columns."""
+        arrays = {"version": np.array(COLUMNAR_VERSION)}
+        for table, columns in TABLES.items():
+            for name, dtype in columns.items():
+                values = self.columns[table][name]
+                if dtype is str:
+                    codes, dictionary = encode_strings(["" if value is None else str(value) for value in values])
+                    arrays[f"{table}.{name}"] = codes
+                    arrays[f"{table}.{name}.dictionary"] = dictionary
+                else:
+                    missing = MISSING[dtype]
+                    arrays[f"{table}.{name}"] = np.array([missing if value is None else value for value in values],
+                                                         dtype=dtype)
+        arrays["pages.text_density"] = np.array(self.text_density, dtype=np.float32).reshape(-1, *DENSITY_GRID)
+        arrays["fonts.pages"] = np.array(self.font_pages, dtype=np.int32)
+        return arrays
+
+    def save(self, path, compress: bool = False):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        (np.savez_compressed if compress else np.savez)(path, **self.arrays())
+
+
+class ColumnarCorpus:
+    """Read side of an export: typed columns, decoded strings and vectorized row masks.
+
+    Arrays are read from the .npz on first use, so a query only loads the columns it touches.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self._columns = {}
+
+    @classmethod
+    def load(cls, path) -> Optional["ColumnarCorpus"]:
+        """Open an export, or None if it was written with another layout version."""
+        arrays = np.load(path, allow_pickle=False)
+        if int(arrays["version"]) != COLUMNAR_VERSION:
+            return None
+        return cls(arrays)
+
+    def column(self, table: str, name: str) -> np.ndarray:
+        """A column as stored (int32 codes for str columns)."""
+        key = f"{table}.{name}"
+        if key not in self._columns:
+            self._columns[key] = self.arrays[key]
+        return self._columns[key]
+
+    def rows(self, table: str) -> int:
+        return len(self.column(table, "filename" if table == "documents" else "doc"))
+
+    def decode(self, table: str, name: str, rows=None) -> np.ndarray:
+        """A str column (or the given rows of it) as strings."""
+        codes = self.column(table, name)
+        return self.column(table, f"{name}.dictionary")[codes if rows is None else codes[rows]]
+
+    def font_pages(self, row: int) -> np.ndarray:
+        """Page numbers a fonts row is used on."""
+        start = self.column("fonts", "pages_start")[row]
+        return self.column("fonts", "pages")[start:start + self.column("fonts", "page_count")[row]]
+
+    def mask(self, table: str, conditions: List[str]) -> np.ndarray:
+        """Rows of table matching every "column<op>value" condition.
+
+        Columns missing from table are looked up on the row's document, so
+        pages can be filtered by provider, category or rendering_approach.
+        """
+        mask = np.ones(self.rows(table), dtype=bool)
+        for condition in conditions:
+            match = CONDITION_RE.match(condition)
+            if not match:
+                raise ValueError(f"Cannot parse condition {condition!r} (expected column<op>value)")
+            name, op, value = match.groups()
+            owner = table if name in TABLES[table] else "documents"
+            if name not in TABLES[owner]:
+                raise ValueError(f"Unknown column {name!r} for table {table}")
+            matched = self._compare(owner, name, op, value)
+            mask &= matched if owner == table else matched[self.column(table, "doc")]
+        return mask
+
+    def _compare(self, table: str, name: str, op: str, value: str) -> np.ndarray:
+        dtype = TABLES[table][name]
+        if dtype is str:
+            if op not in ("==", "!="):
+                raise ValueError(f"{name} is a string column; use == or !=")
+            # Compare codes: the dictionary is searched once, not every row
+            dictionary = self.column(table, f"{name}.dictionary")
+            index = np.searchsorted(dictionary, value)
+            code = index if index < len(dictionary) and dictionary[index] == value else -1
+            return OPERATORS[op](self.column(table, name), code)
+        if dtype is np.bool_:
+            return OPERATORS[op](self.column(table, name), value.lower() in ("1", "true", "yes"))
+        return OPERATORS[op](self.column(table, name), float(value))
+
+    def records(self, table: str, rows: np.ndarray) -> Iterator[Dict]:
+        """Matching rows as dicts, with strings decoded and the document filename attached."""
+        names = list(TABLES[table])
+        values = {name: (self.decode(table, name, rows) if TABLES[table][name] is str
+                         else self.column(table, name)[rows]).tolist() for name in names}
+        if table != "documents":
+            values["filename"] = self.decode("documents", "filename", self.column(table, "doc")[rows]).tolist()
+            names.append("filename")
+        for name in names:
+            if TABLES[table].get(name) is np.float32:
+                values[name] = [None if np.isnan(value) else value for value in values[name]]  # NaN is not JSON
+        for i in range(len(rows)):
+            yield {name: values[name][i] for name in names}
+
+
+def iter_analysis_files(paths: List[Path]) -> Iterator[Dict]:
+    """Analyses in comparison JSON files, single-analysis JSON files and --batch JSONL output."""
+    for path in paths:
+        if path.suffix == ".jsonl":
+            with open(path, "r") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if "comparison" in record:
+                        yield record["comparison"]["original"]
+                        yield record["comparison"]["translated"]
+            continue
+        with open(path, "r") as f:
+            data = json.load(f)
+        if "original" in data and "translated" in data:
+            yield data["original"]
+            yield data["translated"]
+        elif "pages" in data:
+            yield data
+        else:
+            print(f"Skipping {path}: not an analysis or comparison file", file=sys.stderr)
+
+
+def iter_corpus_analyses(originals_dir: Path = ORIGINALS_DIR, translated_dir: Path = TRANSLATED_DIR,
+                         cache_dir=DEFAULT_CACHE_DIR) -> Iterator[Dict]:
+    """Analyze every PDF in originals/ and translated/<provider>/, through the analysis cache."""
+    cache = _make_cache(cache_dir, DEFAULT_MAX_BYTES)
+    for pdf_path in sorted(Path(originals_dir).glob("*.pdf")) + sorted(Path(translated_dir).glob("*/*.pdf")):
+        try:
+            yield analyze_file(str(pdf_path), cache)
+        except Exception as e:
+            print(f"Error analyzing {pdf_path}: {type(e).__name__}: {e}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export analysis results to columnar .npz, or query an export")
+    parser.add_argument('inputs', nargs='*', type=Path,
+                        help='Analysis/comparison JSON or --batch JSONL files (default: analysis/*.json)')
+    parser.add_argument('--corpus', action='store_true',
+                        help='Analyze every PDF in originals/ and translated/ instead of reading files')
+    parser.add_argument('--output', '-o', type=Path, default=DEFAULT_OUTPUT, help='Where to write the export')
+    parser.add_argument('--compress', action='store_true', help='Deflate the arrays (smaller, slower to load)')
+    parser.add_argument('--query', type=Path, metavar='NPZ', help='Query this export instead of writing one')
+    parser.add_argument('--table', choices=TABLES, default="pages", help='Table to query')
+    parser.add_argument('--where', action='append', default=[],
+                        help='Condition such as text_coverage<5 or provider==google (repeatable)')
+    parser.add_argument('--limit', type=int, help='Print at most this many matching rows')
+
+    args = parser.parse_args()
+
+    if args.query:
+        corpus = ColumnarCorpus.load(args.query)
+        if corpus is None:
+            print(f"{args.query} was written with another layout version; re-export it", file=sys.stderr)
+            return 1
+        try:
+            rows = np.flatnonzero(corpus.mask(args.table, args.where))
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        for record in corpus.records(args.table, rows[:args.limit]):
+            print(json.dumps(record))
+        print(f"{len(rows)}/{corpus.rows(args.table)} {args.table} rows match", file=sys.stderr)
+        return 0
+
+    if args.corpus:
+        analyses = iter_corpus_analyses()
+    else:
+        analyses = iter_analysis_files(args.inputs or sorted(ANALYSIS_DIR.glob("*.json")))
+
+    writer = ColumnarWriter()
+    documents = sum(writer.add(analysis) for analysis in analyses)
+    writer.save(args.output, args.compress)
+    print(f"Exported {documents} documents, {len(writer.columns['pages']['doc'])} pages to {args.output}",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Incremental corpus index.
+A SQLite file with one row per PDF under originals/ and translated/<provider>/:
+its path, mtime, size, content hash, the analyzer version that produced the
+row, and a summary of the analysis. A refresh stats every file and re-analyzes
+only those whose (mtime, size) or analyzer version changed; a file that was
+only touched is re-hashed and kept. Rows answer queries by provider, category
+and language without opening any PDF.
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from analysis_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, file_sha256
+from analyze_pdf_structure import (ANALYZER_VERSION, ORIGINALS_DIR, TRANSLATED_DIR, _make_cache, analyze_file,
+                                   document_labels)
+
+REPO_ROOT = Path(__file__).parent.parent
+DEFAULT_INDEX_PATH = REPO_ROOT / ".cache" / "corpus-index.sqlite3"
+
+# Bump when the table layout changes; an index with another version is rebuilt
+INDEX_VERSION = 1
+
+# Summary fields promoted to their own columns so queries can filter and sort on them
+QUERY_COLUMNS = ("role", "provider", "category", "language", "rendering_approach", "producer")
+SUMMARY_COLUMNS = QUERY_COLUMNS + ("page_count", "file_size", "has_searchable_text", "is_form_pdf",
+                                   "font_count", "embedded_font_count", "image_count", "field_count",
+                                   "scanned_pages")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    analyzer_version INTEGER NOT NULL,
+    {", ".join(f"{name} {'TEXT' if name in QUERY_COLUMNS else 'INTEGER'}" for name in SUMMARY_COLUMNS)},
+    summary TEXT NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_labels ON documents (provider, category, language);
+"""
+
+
+def summarize(analysis: Dict, filename: str) -> Dict:
+    """The per-document facts kept in the index (the pages list is reduced to counts)."""
+    fonts = analysis["fonts"].values()
+    pages = analysis["pages"]
+    info = analysis["document_info"]
+    return {
+        **document_labels(filename),
+        "rendering_approach": analysis["rendering_approach"],
+        "producer": analysis["metadata"]["producer"],
+        "page_count": info["page_count"],
+        "file_size": info["file_size"],
+        "has_searchable_text": analysis["text_extraction"]["has_searchable_text"],
+        "is_form_pdf": info["is_form_pdf"],
+        "font_count": len(fonts),
+        "embedded_font_count": sum(1 for font in fonts if font["is_embedded"]),
+        "image_count": analysis["images"]["total_count"],
+        "field_count": analysis["form_fields"]["field_count"],
+        "scanned_pages": sum(1 for page in pages if page["is_scanned"]),
+        "document_info": info,
+        "metadata": analysis["metadata"],
+        "text_extraction": analysis["text_extraction"],
+        "mean_text_coverage": round(sum(page["text_coverage"] for page in pages) / len(pages), 3) if pages else 0.0,
+    }
+
+
+def _index_job(path: str, cache_dir, cache_max_bytes: int) -> Tuple[str, str, Optional[Dict], Optional[str]]:
+    """Process pool job: hash and analyze one file -> (path, sha256, summary, error)."""
+    try:
+        sha256 = file_sha256(path)
+        analysis = analyze_file(path, _make_cache(cache_dir, cache_max_bytes))
+        return path, sha256, summarize(analysis, Path(path).name), None
+    except Exception as e:
+        return path, "", None, f"{type(e).__name__}: {e}"
+
+
+def scan_corpus(originals_dir: Path = ORIGINALS_DIR, translated_dir: Path = TRANSLATED_DIR) -> Dict[str, Tuple[int, int]]:
+    """Every corpus PDF -> (mtime_ns, size), from directory entries alone."""
+    found = {}
+    dirs = [Path(originals_dir)]
+    if Path(translated_dir).is_dir():
+        with os.scandir(translated_dir) as entries:
+            dirs.extend(Path(entry.path) for entry in entries if entry.is_dir())
+    for directory in dirs:
+        if not directory.is_dir():
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".pdf") and entry.is_file():
+                    st = entry.stat()
+                    found[entry.path] = (st.st_mtime_ns, st.st_size)
+    return found
+
+
+class CorpusIndex:
+    """SQLite index of corpus files and their analysis summaries."""
+
+    def __init__(self, db_path=DEFAULT_INDEX_PATH, root: Path = REPO_ROOT):
+        self.db_path = Path(db_path)
+        self.root = Path(root).resolve()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is not None and row["value"] == str(INDEX_VERSION):
+                return
+            self.conn.execute("DROP TABLE documents")
+            self.conn.executescript(SCHEMA)
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(INDEX_VERSION),))
+
+    def _key(self, path: str) -> str:
+        """Paths are stored relative to the repository root where possible, so the index survives a move."""
+        try:
+            return Path(path).resolve().relative_to(self.root).as_posix()
+        except ValueError:
+            return str(Path(path).resolve())
+
+    def _path(self, key: str) -> str:
+        return str(self.root / key) if not Path(key).is_absolute() else key
+
+    def refresh(self, originals_dir: Path = ORIGINALS_DIR, translated_dir: Path = TRANSLATED_DIR,
+                workers: Optional[int] = None, cache_dir=DEFAULT_CACHE_DIR,
+                cache_max_bytes: int = DEFAULT_MAX_BYTES) -> Dict:
+        """Bring the index up to date with the tree and return what was done."""
+        start = perf_counter()
+        found = {self._key(path): fingerprint for path, fingerprint in scan_corpus(originals_dir,
+                                                                                   translated_dir).items()}
+        stored = {row["path"]: row for row in
+                  self.conn.execute("SELECT path, mtime_ns, size, sha256, analyzer_version FROM documents")}
+
+        stats = {"scanned": len(found), "unchanged": 0, "touched": 0, "analyzed": 0, "removed": 0, "failed": 0}
+        stale = []
+        touched = []
+        for key, (mtime_ns, size) in found.items():
+            row = stored.get(key)
+            if row is None or row["analyzer_version"] != ANALYZER_VERSION:
+                stale.append(key)
+            elif (row["mtime_ns"], row["size"]) == (mtime_ns, size):
+                stats["unchanged"] += 1
+            elif row["size"] == size and file_sha256(self._path(key)) == row["sha256"]:
+                touched.append((mtime_ns, key))  # Same bytes, new mtime (checkout, copy, touch)
+            else:
+                stale.append(key)
+        removed = [(key,) for key in stored if key not in found]
+
+        with self.conn:
+            self.conn.executemany("UPDATE documents SET mtime_ns = ? WHERE path = ?", touched)
+            self.conn.executemany("DELETE FROM documents WHERE path = ?", removed)
+            for path, sha256, summary, error in self._analyze(stale, workers, cache_dir, cache_max_bytes):
+                key = self._key(path)
+                if error:
+                    stats["failed"] += 1
+                    print(f"Error indexing {key}: {error}", file=sys.stderr)
+                    continue
+                self._store(key, found[key], sha256, summary)
+                stats["analyzed"] += 1
+        stats["touched"] = len(touched)
+        stats["removed"] = len(removed)
+        stats["seconds"] = round(perf_counter() - start, 3)
+        return stats
+
+    def _analyze(self, keys: List[str], workers: Optional[int], cache_dir,
+                 cache_max_bytes: int) -> Iterator[Tuple[str, str, Optional[Dict], Optional[str]]]:
+        paths = [self._path(key) for key in keys]
+        workers = min(workers or os.cpu_count() or 1, len(paths))
+        if workers <= 1:
+            for path in paths:
+                yield _index_job(path, cache_dir, cache_max_bytes)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(_index_job, paths, [cache_dir] * len(paths), [cache_max_bytes] * len(paths))
+
+    def _store(self, key: str, fingerprint: Tuple[int, int], sha256: str, summary: Dict):
+        columns = ("path", "mtime_ns", "size", "sha256", "analyzer_version") + SUMMARY_COLUMNS + ("summary", "indexed_at")
+        values = (key, *fingerprint, sha256, ANALYZER_VERSION, *(summary[name] for name in SUMMARY_COLUMNS),
+                  json.dumps(summary), datetime.now(timezone.utc).isoformat(timespec="seconds"))
+        self.conn.execute(f"INSERT OR REPLACE INTO documents ({', '.join(columns)}) "
+                          f"VALUES ({', '.join('?' * len(columns))})", values)
+
+    def query(self, full: bool = False, **filters) -> List[Dict]:
+        """Rows matching every column=value filter (None values are ignored), ordered by path."""
+        unknown = set(filters).difference(QUERY_COLUMNS)
+        if unknown:
+            raise ValueError(f"Cannot filter on {', '.join(sorted(unknown))} (choose from {', '.join(QUERY_COLUMNS)})")
+        filters = {name: value for name, value in filters.items() if value is not None}
+        where = " AND ".join(f"{name} = ?" for name in filters) or "1"
+        columns = ("path", "sha256") + SUMMARY_COLUMNS + (("summary",) if full else ())
+        rows = self.conn.execute(f"SELECT {', '.join(columns)} FROM documents WHERE {where} ORDER BY path",
+                                 tuple(filters.values()))
+        results = []
+        for row in rows:
+            result = dict(row)
+            if full:
+                result["summary"] = json.loads(result["summary"])
+            results.append(result)
+        return results
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally index the corpus and query it")
+    parser.add_argument('--db', type=Path, default=DEFAULT_INDEX_PATH, help='Index database path')
+    parser.add_argument('--originals', type=Path, default=ORIGINALS_DIR, help='Originals directory')
+    parser.add_argument('--translated', type=Path, default=TRANSLATED_DIR, help='Translated directory')
+    parser.add_argument('--workers', type=int, help='Worker processes for changed files (default: CPU count)')
+    parser.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR, help='Analysis cache directory')
+    parser.add_argument('--no-refresh', action='store_true', help='Query the index as it is, without rescanning')
+    parser.add_argument('--list', action='store_true', help='List indexed documents (implied by any filter)')
+    parser.add_argument('--full', action='store_true', help='Include the stored summary in listed documents')
+    for name in QUERY_COLUMNS:
+        parser.add_argument(f"--{name.replace('_', '-')}", help=f'Only list documents with this {name}')
+
+    args = parser.parse_args()
+
+    index = CorpusIndex(args.db)
+    try:
+        if not args.no_refresh:
+            stats = index.refresh(args.originals, args.translated, args.workers, args.cache_dir)
+            print(", ".join(f"{name}: {value}" for name, value in stats.items()), file=sys.stderr)
+        filters = {name: getattr(args, name) for name in QUERY_COLUMNS}
+        if args.list or any(value is not None for value in filters.values()):
+            for row in index.query(args.full, **filters):
+                print(json.dumps(row))
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Page coverage from a NumPy occupancy grid.
+Text spans, image placements and drawing bboxes are rasterised onto a grid of
+cells, so overlapping boxes are counted once and coverage never exceeds 100%.
+"""
+
+import math
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Grid cell edge in PDF points; boxes are snapped to the nearest cell boundary
+DEFAULT_CELL_SIZE = 1.0
+
+# Rows x columns of the per-region text density map
+DENSITY_GRID = (4, 4)
+
+
+def boxes_to_array(boxes: Iterable) -> np.ndarray:
+    """Stack (x0, y0, x1, y1) boxes or fitz.Rects into an (n, 4) float array."""
+    array = np.asarray([tuple(box)[:4] for box in boxes], dtype=np.float64)
+    return array.reshape(-1, 4)
+
+
+def occupancy_counts(boxes: np.ndarray, page_rect, cell_size: float = DEFAULT_CELL_SIZE) -> np.ndarray:
+    """Number of boxes covering each grid cell of the page.
+
+    All boxes are painted at once with a 2D difference array: each box adds
+    +1/-1 at its four corners and two cumulative sums recover the counts.
+    """
+    x0, y0, x1, y1 = tuple(page_rect)[:4]
+    width, height = max(x1 - x0, 0), max(y1 - y0, 0)
+    cols = max(1, math.ceil(width / cell_size))
+    rows = max(1, math.ceil(height / cell_size))
+    if len(boxes) == 0:
+        return np.zeros((rows, cols), dtype=np.int32)
+
+    shifted = boxes - np.array([x0, y0, x0, y0])
+    c0 = np.clip(np.rint(shifted[:, 0] / cell_size), 0, cols).astype(np.intp)
+    r0 = np.clip(np.rint(shifted[:, 1] / cell_size), 0, rows).astype(np.intp)
+    c1 = np.clip(np.rint(shifted[:, 2] / cell_size), 0, cols).astype(np.intp)
+    r1 = np.clip(np.rint(shifted[:, 3] / cell_size), 0, rows).astype(np.intp)
+    keep = (c1 > c0) & (r1 > r0)
+    c0, r0, c1, r1 = c0[keep], r0[keep], c1[keep], r1[keep]
+
+    diff = np.zeros((rows + 1, cols + 1), dtype=np.int32)
+    np.add.at(diff, (r0, c0), 1)
+    np.add.at(diff, (r0, c1), -1)
+    np.add.at(diff, (r1, c0), -1)
+    np.add.at(diff, (r1, c1), 1)
+    return diff.cumsum(axis=0).cumsum(axis=1)[:rows, :cols]
+
+
+def region_density(occupied: np.ndarray, grid: Tuple[int, int] = DENSITY_GRID) -> List[List[float]]:
+    """Fraction of occupied cells in each region of a rows x cols split of the page."""
+    rows, cols = occupied.shape
+    grid_rows, grid_cols = min(grid[0], rows), min(grid[1], cols)
+    row_edges = np.linspace(0, rows, grid_rows + 1).astype(np.intp)
+    col_edges = np.linspace(0, cols, grid_cols + 1).astype(np.intp)
+
+    sums = np.add.reduceat(np.add.reduceat(occupied.astype(np.int32), row_edges[:-1], axis=0),
+                           col_edges[:-1], axis=1)
+    cells = np.outer(np.diff(row_edges), np.diff(col_edges))
+    return np.round(sums / cells, 3).tolist()
+
+
+def page_coverage(page_rect, text_boxes: np.ndarray, image_boxes: np.ndarray,
+                  drawing_boxes: np.ndarray, cell_size: float = DEFAULT_CELL_SIZE) -> Dict:
+    """Union coverage (percent of page) per content kind, plus a text density map."""
+    text = occupancy_counts(text_boxes, page_rect, cell_size) > 0
+    image = occupancy_counts(image_boxes, page_rect, cell_size) > 0
+    drawing = occupancy_counts(drawing_boxes, page_rect, cell_size) > 0
+    content = text | image | drawing
+
+    total = content.size
+    return {
+        "text_coverage": 100.0 * np.count_nonzero(text) / total,
+        "image_coverage": 100.0 * np.count_nonzero(image) / total,
+        "drawing_coverage": 100.0 * np.count_nonzero(drawing) / total,
+        "content_coverage": 100.0 * np.count_nonzero(content) / total,
+        "text_density": region_density(text),
+    }
@@ -6,19 +6,30 @@ Only downloads PDFs that are clearly redistributable (public domain, CC licensed
 
 import os
 import sys
+import time
 import yaml
-import hashlib
+import tempfile
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional
 from urllib.parse import urlparse
 
+from analysis_cache import file_sha256
+
 # Configuration
 SAMPLES_DIR = Path(__file__).parent.parent / "samples"
 MANIFEST_FILE = SAMPLES_DIR / "manifest.yaml"
 ORIGINALS_DIR = Path(__file__).parent.parent / "originals"
 USER_AGENT = "Mozilla/5.0 (PDF Sample Fetcher for Testing)"
-CHUNK_SIZE = 8192
+CHUNK_SIZE = 64 * 1024
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 3
+BACKOFF_SECONDS = 1.0
+PART_SUFFIX = ".part"
+# Next to a .part file: the ETag or Last-Modified of the response it holds, sent as If-Range on resume
+VALIDATOR_SUFFIX = ".validator"
 
 # Public domain / freely available samples
 FETCH_URLS = {
@@ -28,69 +39,208 @@ FETCH_URLS = {
     # Add more URLs as they are verified to be redistributable
 }
 
+class IncompleteDownloadError(requests.exceptions.RequestException):
+    """The connection ended before the advertised number of bytes arrived."""
+
+
 class PDFFetcher:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({"User-Agent": USER_AGENT})
+    def __init__(self, manifest_file: Path = MANIFEST_FILE, originals_dir: Path = ORIGINALS_DIR,
+                 workers: int = DEFAULT_WORKERS, retries: int = DEFAULT_RETRIES,
+                 backoff: float = BACKOFF_SECONDS):
+        self.manifest_file = Path(manifest_file)
+        self.originals_dir = Path(originals_dir)
+        self.workers = max(1, workers)
+        self.retries = max(1, retries)
+        self.backoff = backoff
+        self._local = threading.local()
         self.manifest = self._load_manifest()
+
+    @property
+    def session(self) -> requests.Session:
+        """One HTTP session per thread; requests.Session is not thread-safe."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({"User-Agent": USER_AGENT})
+            self._local.session = session
+        return session
     
     def _load_manifest(self) -> Dict:
         """Load the manifest.yaml file."""
-        if not MANIFEST_FILE.exists():
-            print(f"Error: Manifest file not found at {MANIFEST_FILE}")
+        if not self.manifest_file.exists():
+            print(f"Error: Manifest file not found at {self.manifest_file}")
             sys.exit(1)
         
-        with open(MANIFEST_FILE, 'r') as f:
+        with open(self.manifest_file, 'r') as f:
             return yaml.safe_load(f)
     
     def _get_file_hash(self, filepath: Path) -> str:
         """Calculate SHA256 hash of a file."""
-        sha256_hash = hashlib.sha256()
-        with open(filepath, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+        return file_sha256(filepath)
     
-    def _download_file(self, url: str, dest_path: Path) -> bool:
-        """Download a file from URL to destination path."""
-        try:
-            print(f"  Downloading from: {url}")
-            response = self.session.get(url, stream=True, timeout=30)
+    def _save_manifest(self):
+        """Write the manifest back atomically, keeping its key order."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.manifest_file.parent, suffix=".tmp")
+        with os.fdopen(fd, 'w') as f:
+            yaml.safe_dump(self.manifest, f, sort_keys=False, allow_unicode=True)
+        os.replace(tmp_path, self.manifest_file)
+
+    def _download_file(self, url: str, dest_path: Path, validators: Optional[Dict] = None,
+                       expected_sha256: Optional[str] = None) -> Optional[Dict]:
+        """Download a file from URL to destination path, resuming and retrying as needed.
+
+        Data goes to a .part file next to the destination, which is renamed
+        into place only once complete, so an interrupted download never
+        leaves a truncated file at dest_path. With validators (etag,
+        last_modified) the request is conditional and a 304 leaves dest_path
+        untouched. With expected_sha256 a download with other content is
+        discarded and dest_path left as it was. Returns the status and
+        response validators, or None on failure.
+        """
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        part_path = dest_path.with_name(dest_path.name + PART_SUFFIX)
+        validator_path = part_path.with_name(part_path.name + VALIDATOR_SUFFIX)
+        print(f"  Downloading from: {url}")
+
+        for attempt in range(1, self.retries + 1):
+            try:
+                attempt_result = self._download_attempt(url, part_path, validators)
+                if attempt_result is None:
+                    return {"status": "not_modified"}
+                response_headers, headers_complete = attempt_result
+                actual = self._get_file_hash(part_path)
+                if expected_sha256 and actual != expected_sha256:
+                    print(f"  Downloaded {dest_path.name} does not match the manifest sha256: "
+                          f"expected {expected_sha256[:12]}, got {actual[:12]} (use --update-hashes to accept it)")
+                    part_path.unlink()
+                    validator_path.unlink(missing_ok=True)
+                    return None
+                os.replace(part_path, dest_path)
+                validator_path.unlink(missing_ok=True)
+                return {
+                    "status": "downloaded",
+                    "sha256": actual,
+                    "etag": response_headers.get('ETag'),
+                    "last_modified": response_headers.get('Last-Modified'),
+                    # False when only the If-Range validator is known: keep the recorded ones
+                    "headers_complete": headers_complete,
+                }
+            except requests.exceptions.RequestException as e:
+                response = getattr(e, "response", None)
+                status = response.status_code if response is not None else None
+                permanent = status is not None and status < 500 and status not in (408, 429)
+                print(f"  Error downloading {dest_path.name} (attempt {attempt}/{self.retries}): {e}")
+                if permanent or attempt == self.retries:
+                    break
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+
+        return None
+
+    def _download_attempt(self, url: str, part_path: Path, validators: Optional[Dict] = None):
+        """Fetch url into part_path, continuing from its current size with a Range request.
+
+        A resume sends If-Range with the validator of the response the partial
+        file came from, so a changed file is sent whole instead of appended to
+        a stale prefix; a partial file without a validator is started over.
+        Returns (response headers, whether they are the full response headers),
+        or None if a conditional request got 304 Not Modified.
+        """
+        validator_path = part_path.with_name(part_path.name + VALIDATOR_SUFFIX)
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        range_validator = validator_path.read_text().strip() if offset and validator_path.exists() else ""
+        if not range_validator:
+            offset = 0
+        headers = {"Range": f"bytes={offset}-", "If-Range": range_validator} if offset else {}
+        if validators and not offset:
+            if validators.get('etag'):
+                headers["If-None-Match"] = validators['etag']
+            if validators.get('last_modified'):
+                headers["If-Modified-Since"] = validators['last_modified']
+
+        with self.session.get(url, stream=True, timeout=30, headers=headers) as response:
+            if response.status_code == 304:
+                return None
+            if response.status_code == 416 and offset:
+                # "bytes */<total>": a partial file as long as the resource was complete when interrupted
+                total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                if total == str(offset):
+                    print(f"  {part_path.name} was already complete")
+                    return {"ETag" if range_validator.startswith('"') else "Last-Modified": range_validator}, False
+                part_path.unlink()
+                validator_path.unlink(missing_ok=True)
+                print(f"  Range not satisfiable at offset {offset}; restarting {part_path.name}")
+                return self._download_attempt(url, part_path, validators)
             response.raise_for_status()
-            
-            # Create parent directory if it doesn't exist
-            dest_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Download with progress indication
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-            
-            with open(dest_path, 'wb') as f:
+
+            if offset and response.status_code != 206:
+                offset = 0  # Server ignored the Range header or the file changed, and sent it whole
+            elif offset:
+                print(f"  Resuming {part_path.name} at byte {offset}")
+            if not offset:
+                self._save_validator(validator_path, response.headers)
+
+            expected = offset + int(response.headers.get('content-length', 0) or 0)
+            downloaded = offset
+            with open(part_path, 'ab' if offset else 'wb') as f:
                 for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
                     if chunk:
                         f.write(chunk)
                         downloaded += len(chunk)
-                        if total_size > 0:
-                            progress = (downloaded / total_size) * 100
-                            print(f"\r  Progress: {progress:.1f}%", end='', flush=True)
-            
-            print()  # New line after progress
-            return True
-            
-        except requests.exceptions.RequestException as e:
-            print(f"  Error downloading: {e}")
+
+        if expected > offset and downloaded < expected:
+            raise IncompleteDownloadError(f"Received {downloaded} of {expected} bytes")
+        return response.headers, True
+
+    def _save_validator(self, validator_path: Path, response_headers) -> None:
+        """Record what If-Range can match: a strong ETag, else Last-Modified."""
+        etag = response_headers.get('ETag') or ""
+        validator = etag if etag and not etag.startswith("W/") else response_headers.get('Last-Modified')
+        if validator:
+            validator_path.write_text(validator)
+        else:
+            validator_path.unlink(missing_ok=True)
+
+    def _verify_local(self, sample_info: Dict, dest_path: Path) -> bool:
+        """Check an existing file against the manifest sha256; a file without one is unverified."""
+        expected = sample_info.get('sha256')
+        if not expected:
+            print(f"  No sha256 pinned for {dest_path.name}; it cannot be verified")
             return False
+        actual = self._get_file_hash(dest_path)
+        if actual != expected:
+            print(f"  Hash mismatch for {dest_path.name}: expected {expected[:12]}, got {actual[:12]}")
+            return False
+        return True
     
-    def fetch_sample(self, sample_id: str, sample_info: Dict) -> bool:
-        """Fetch a single PDF sample."""
+    def fetch_sample(self, sample_id: str, sample_info: Dict, refresh: bool = False,
+                     update_hashes: bool = False) -> bool:
+        """Fetch a single PDF sample.
+
+        An existing file is verified against the manifest sha256 and
+        re-downloaded if it does not match or no sha256 is pinned. With
+        refresh=True it is also revalidated with a conditional GET using the
+        recorded ETag and Last-Modified, and re-downloaded only if the server
+        content changed. A download must match the pinned sha256 unless none
+        is pinned or refresh/update_hashes accepts new content; the manifest
+        entry is then updated with the sha256 and validators of the download.
+        """
         # Determine the destination path - now flat structure
         filename = sample_info.get('filename', f"{sample_id}.pdf")
-        dest_path = ORIGINALS_DIR / filename
+        dest_path = self.originals_dir / filename
+        validators = None
         
         # Check if file already exists
         if dest_path.exists():
-            print(f"  File already exists: {dest_path}")
-            return True
+            if not self._verify_local(sample_info, dest_path):
+                print(f"  Re-downloading unverified file: {dest_path}")
+            elif not refresh:
+                print(f"  File already exists and verified: {dest_path}")
+                return True
+            else:
+                validators = {
+                    'etag': sample_info.get('etag'),
+                    'last_modified': sample_info.get('last_modified'),
+                }
         
         # Check if we have a URL for this sample
         source_url = sample_info.get('source_url')
@@ -115,11 +265,33 @@ class PDFFetcher:
             return False
         
         # Download the file
-        return self._download_file(source_url, dest_path)
+        expected_sha256 = None if refresh or update_hashes else sample_info.get('sha256')
+        result = self._download_file(source_url, dest_path, validators, expected_sha256)
+        if result is None:
+            return False
+        if result["status"] == "not_modified":
+            print(f"  Not modified: {dest_path}")
+            return True
+
+        if sample_info.get('sha256') not in (None, result["sha256"]):
+            print(f"  Updating the pinned sha256 of {dest_path.name} to {result['sha256'][:12]}")
+        sample_info['sha256'] = result["sha256"]
+        for key in ('etag', 'last_modified'):
+            if result.get(key):
+                sample_info[key] = result[key]
+            elif result["headers_complete"]:
+                sample_info.pop(key, None)
+        return True
     
-    def fetch_all(self, sample_ids: Optional[List[str]] = None):
-        """Fetch all or specified PDF samples."""
+    def fetch_all(self, sample_ids: Optional[List[str]] = None, refresh: bool = False,
+                  update_hashes: bool = False) -> Dict[str, bool]:
+        """Fetch, verify or refresh all or specified PDF samples, up to self.workers at a time.
+
+        Hash verification and conditional requests run in the same worker threads,
+        and the manifest is saved once at the end if any entry changed.
+        """
         samples = self.manifest.get('samples', [])
+        jobs = []
         
         for sample in samples:
             sample_id = sample.get('id')
@@ -138,11 +310,23 @@ class PDFFetcher:
                 print(f"  Skipping - requires manual creation (source: {source})")
                 continue
             
-            # Try to fetch
-            if self.fetch_sample(sample_id, sample):
+            jobs.append((sample_id, sample))
+
+        snapshot = yaml.safe_dump(self.manifest, sort_keys=False)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            outcomes = list(executor.map(lambda job: self.fetch_sample(*job, refresh=refresh,
+                                                                       update_hashes=update_hashes), jobs))
+        if yaml.safe_dump(self.manifest, sort_keys=False) != snapshot:
+            self._save_manifest()
+
+        results = {}
+        for (sample_id, _), fetched in zip(jobs, outcomes):
+            results[sample_id] = fetched
+            if fetched:
                 print(f"  Successfully fetched: {sample_id}")
             else:
                 print(f"  Could not fetch: {sample_id}")
+        return results
     
     def generate_placeholder(self, sample_id: str):
         """Generate a placeholder PDF for testing."""
@@ -158,7 +342,7 @@ class PDFFetcher:
         
         category = sample.get('category', 'uncategorized')
         filename = sample.get('filename', f"{sample_id}.pdf")
-        dest_path = ORIGINALS_DIR / filename
+        dest_path = self.originals_dir / filename
         
         if dest_path.exists():
             print(f"File already exists: {dest_path}")
@@ -193,19 +377,25 @@ def main():
     parser.add_argument('samples', nargs='*', help='Specific sample IDs to fetch')
     parser.add_argument('--all', action='store_true', help='Fetch all samples')
     parser.add_argument('--placeholder', help='Generate placeholder for specific sample')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Revalidate existing files with conditional requests and re-download changed ones')
+    parser.add_argument('--update-hashes', action='store_true',
+                        help='Accept downloads that do not match the pinned sha256 and pin their hash')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Concurrent downloads')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help='Attempts per download')
     
     args = parser.parse_args()
     
-    fetcher = PDFFetcher()
+    fetcher = PDFFetcher(workers=args.workers, retries=args.retries)
     
     if args.placeholder:
         fetcher.generate_placeholder(args.placeholder)
     elif args.all or not args.samples:
         print("Fetching all available samples...")
-        fetcher.fetch_all()
+        fetcher.fetch_all(refresh=args.refresh, update_hashes=args.update_hashes)
     else:
         print(f"Fetching specified samples: {args.samples}")
-        fetcher.fetch_all(args.samples)
+        fetcher.fetch_all(args.samples, refresh=args.refresh, update_hashes=args.update_hashes)
     
     print("\nDone!")
     print("\nNote: Some samples require manual creation or acquisition:")
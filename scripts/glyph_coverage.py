@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Glyph-coverage index for fallback fonts and font subsetting.
+Records, for each font buffer, which Unicode codepoints it has glyphs for, as one
+row of a bit matrix saved with its font list in a single file. Workers memory-map
+it, so the table is built once and its pages are shared between processes;
+choosing a fallback font for a span is then a lookup instead of a per-character
+font query.
+"""
+
+import io
+import os
+import sys
+import json
+import hashlib
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+
+REPO_ROOT = Path(__file__).parent.parent
+ORIGINALS_DIR = REPO_ROOT / "originals"
+DEFAULT_INDEX_DIR = REPO_ROOT / ".cache" / "glyphs"
+
+# Bump when the on-disk layout changes
+INDEX_VERSION = 2
+INDEX_FILE = f"coverage-v{INDEX_VERSION}.idx"
+
+# Index file layout: magic, 8-byte little-endian JSON length, JSON (MuPDF version and
+# font list), zero padding to a multiple of HEADER_ALIGN, then the bit matrix rows
+INDEX_MAGIC = b"GLYPHIDX"
+HEADER_ALIGN = 4096
+
+# Planes 0-2 (BMP, SMP, CJK Extension B); codepoints above are treated as uncovered
+CODEPOINT_LIMIT = 0x30000
+ROW_BYTES = CODEPOINT_LIMIT // 8
+
+# PyMuPDF built-in fonts, indexed under their short names
+BUILTIN_FONTS = ("helv", "tiro", "cour", "cjk", "symb", "zadb")
+
+
+def coverage_row(codepoints: Iterable[int]) -> np.ndarray:
+    """Pack a set of codepoints into one index row (bit cp set if covered)."""
+    bits = np.zeros(CODEPOINT_LIMIT, dtype=bool)
+    cps = np.fromiter(codepoints, dtype=np.int64)
+    bits[cps[(cps >= 0) & (cps < CODEPOINT_LIMIT)]] = True
+    return np.packbits(bits)
+
+
+def buffer_key(buffer: bytes) -> str:
+    """Index key of an embedded font: the SHA-256 of its buffer, so identical subsets share a row."""
+    return hashlib.sha256(buffer).hexdigest()
+
+
+class GlyphCoverageIndex:
+    """Bit matrix of font x codepoint, with the font list alongside it.
+
+    fonts holds one entry per row: {"key", "name", "glyphs"}. Built-in fonts
+    are keyed by their short name ("helv", "cjk"), embedded fonts by buffer_key.
+    """
+
+    def __init__(self, bits: np.ndarray, fonts: List[Dict], mupdf_version: str = fitz.VersionBind):
+        self.bits = bits
+        self.fonts = fonts
+        self.mupdf_version = mupdf_version
+        self.rows = {font["key"]: row for row, font in enumerate(fonts)}
+        self._choices = {}
+
+    @classmethod
+    def build(cls, font_buffers: Optional[Dict[str, bytes]] = None) -> "GlyphCoverageIndex":
+        """Index the built-in fonts plus any key -> font buffer given."""
+        fonts = []
+        rows = []
+        for name in BUILTIN_FONTS:
+            font = fitz.Font(name)
+            fonts.append({"key": name, "name": font.name, "glyphs": font.glyph_count})
+            rows.append(coverage_row(font.valid_codepoints()))
+        for key, buffer in (font_buffers or {}).items():
+            try:
+                font = fitz.Font(fontbuffer=buffer)
+            except (RuntimeError, ValueError):
+                continue  # Type3 and other fonts MuPDF cannot load standalone
+            fonts.append({"key": key, "name": font.name, "glyphs": font.glyph_count})
+            rows.append(coverage_row(font.valid_codepoints()))
+        return cls(np.vstack(rows), fonts)
+
+    @classmethod
+    def load(cls, index_dir=DEFAULT_INDEX_DIR) -> Optional["GlyphCoverageIndex"]:
+        """Memory-map a saved index, or None if it is missing, unreadable or was built by another version.
+
+        The font list and the matrix are read through one file handle, so a
+        concurrent save, which swaps in a whole new file, cannot mix two indexes.
+        """
+        try:
+            with open(Path(index_dir) / INDEX_FILE, "rb") as f:
+                meta, offset = cls._read_header(f)
+                if meta.get("mupdf") != fitz.VersionBind:
+                    return None
+                bits = np.memmap(f, dtype=np.uint8, mode="r", offset=offset,
+                                 shape=(len(meta["fonts"]), ROW_BYTES))
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(bits, meta["fonts"], meta["mupdf"])
+
+    @staticmethod
+    def _read_header(f) -> Tuple[Dict, int]:
+        """(metadata, offset of the bit matrix) of an index file."""
+        if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            raise ValueError("Not a glyph-coverage index")
+        length = int.from_bytes(f.read(8), "little")
+        meta = json.loads(f.read(length))
+        return meta, -(-(len(INDEX_MAGIC) + 8 + length) // HEADER_ALIGN) * HEADER_ALIGN
+
+    @classmethod
+    def _replaceable(cls, index_dir) -> bool:
+        """Whether a save may replace what is there: no index, or a readable one built by another MuPDF."""
+        try:
+            with open(Path(index_dir) / INDEX_FILE, "rb") as f:
+                meta, _ = cls._read_header(f)
+        except FileNotFoundError:
+            return True
+        except (OSError, ValueError):
+            return False
+        return meta.get("mupdf") != fitz.VersionBind
+
+    @classmethod
+    def open(cls, index_dir=DEFAULT_INDEX_DIR, save: bool = True) -> "GlyphCoverageIndex":
+        """Load the saved index, or build the built-in fonts' index.
+
+        With save=True the built index is saved, unless an index file is there
+        that could not be read: it is never overwritten by a smaller rebuild.
+        """
+        index = cls.load(index_dir)
+        if index is not None:
+            return index
+        index = cls.build()
+        if save and cls._replaceable(index_dir):
+            index.save(index_dir)
+        return index
+
+    def save(self, index_dir=DEFAULT_INDEX_DIR):
+        """Write the font list and bit matrix to one file and swap it in with a single rename."""
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        meta = json.dumps({"mupdf": self.mupdf_version, "fonts": self.fonts}).encode()
+        header = INDEX_MAGIC + len(meta).to_bytes(8, "little") + meta
+        padding = -len(header) % HEADER_ALIGN
+        fd, tmp_path = tempfile.mkstemp(dir=index_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header + b"\0" * padding)
+                f.write(np.ascontiguousarray(self.bits, dtype=np.uint8).tobytes())
+            os.replace(tmp_path, index_dir / INDEX_FILE)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def with_fonts(self, font_buffers: Dict[str, bytes]) -> "GlyphCoverageIndex":
+        """A copy of the index with rows added for the font buffers it does not have yet."""
+        new = {key: buffer for key, buffer in font_buffers.items() if key not in self.rows}
+        if not new:
+            return self
+        added = GlyphCoverageIndex.build(new)
+        builtin_rows = len(BUILTIN_FONTS)
+        return GlyphCoverageIndex(np.vstack([np.asarray(self.bits), added.bits[builtin_rows:]]),
+                                  self.fonts + added.fonts[builtin_rows:], self.mupdf_version)
+
+    def covered(self, keys: List[str], codepoints: np.ndarray) -> np.ndarray:
+        """Boolean matrix: whether font keys[i] has a glyph for codepoints[j]."""
+        rows = np.array([self.rows[key] for key in keys], dtype=np.intp)
+        in_range = codepoints < CODEPOINT_LIMIT
+        cps = np.where(in_range, codepoints, 0)
+        packed = self.bits[rows[:, None], cps[None, :] >> 3]
+        return ((packed >> (7 - (cps & 7))) & 1).astype(bool) & in_range
+
+    def missing(self, key: str, text: str) -> str:
+        """The distinct characters of text the font has no glyph for."""
+        chars = sorted(set(text))
+        cps = np.array([ord(ch) for ch in chars], dtype=np.int64)
+        covered = self.covered([key], cps)[0] if chars else []
+        return "".join(ch for ch, ok in zip(chars, covered) if not ok)
+
+    def fallback_runs(self, text: str, chain: List[str]) -> List[Tuple[str, str]]:
+        """Split text into (font key, run) pieces, each character taking the first font in chain that has it.
+
+        Characters no font covers are dropped (e.g. bidi marks), except
+        whitespace, which stays with the run around it.
+        """
+        # Per-chain memo of each character's position in the chain (-1: no font has it)
+        choices = self._choices.setdefault(tuple(chain), {})
+        new_chars = list(set(text).difference(choices))
+        if new_chars:
+            covered = self.covered(chain, np.array([ord(ch) for ch in new_chars], dtype=np.int64))
+            picked = np.where(covered.any(axis=0), covered.argmax(axis=0), -1)
+            choices.update(zip(new_chars, picked.tolist()))
+
+        runs = []
+        for ch in text:
+            index = choices[ch]
+            if index < 0:
+                if not ch.isspace():
+                    continue
+                index = runs[-1][0] if runs else 0
+            if runs and runs[-1][0] == index:
+                runs[-1][1].append(ch)
+            else:
+                runs.append((index, [ch]))
+        return [(chain[index], "".join(chars)) for index, chars in runs]
+
+
+def document_font_buffers(doc) -> Dict[str, bytes]:
+    """Embedded font buffers of a document, keyed by buffer_key."""
+    buffers = {}
+    for page in doc:
+        for xref, ext, *_ in page.get_fonts(full=True):
+            if ext == "n/a":
+                continue  # Not embedded, or Type3
+            buffer = doc.extract_font(xref)[3]
+            if buffer:
+                buffers[buffer_key(buffer)] = buffer
+    return buffers
+
+
+def subset_font_buffer(buffer: bytes, codepoints: Iterable[int]) -> Optional[bytes]:
+    """Subset a TrueType/OpenType font to codepoints, keeping glyph ids.
+
+    Glyph ids are retained because PDF text written with an Identity-H
+    encoding refers to glyphs by id. Returns None if fontTools cannot read the font.
+    """
+    from fontTools import subset
+    from fontTools.ttLib import TTFont, TTLibError
+
+    options = subset.Options()
+    options.retain_gids = True
+    options.notdef_outline = True
+    options.name_IDs = ["*"]
+    try:
+        font = TTFont(io.BytesIO(buffer))
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=codepoints)
+        subsetter.subset(font)
+        out = io.BytesIO()
+        font.save(out)
+    except (TTLibError, AssertionError, KeyError):
+        return None
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the glyph-coverage index")
+    parser.add_argument('pdf_files', nargs='*', type=Path,
+                        help='PDFs whose embedded fonts to index (default: every PDF in originals/)')
+    parser.add_argument('--index-dir', type=Path, default=DEFAULT_INDEX_DIR, help='Where to store the index')
+    parser.add_argument('--builtin-only', action='store_true', help='Index only the PyMuPDF built-in fonts')
+    parser.add_argument('--text', help='Report which indexed fonts lack glyphs for this text')
+
+    args = parser.parse_args()
+
+    index = GlyphCoverageIndex.open(args.index_dir)
+    if not args.builtin_only:
+        buffers = {}
+        for pdf_path in args.pdf_files or sorted(ORIGINALS_DIR.glob("*.pdf")):
+            with fitz.open(pdf_path) as doc:
+                buffers.update(document_font_buffers(doc))
+        rebuilt = index.with_fonts(buffers)
+        if rebuilt is not index:
+            rebuilt.save(args.index_dir)
+            index = rebuilt
+
+    print(f"{len(index.fonts)} fonts indexed in {args.index_dir}")
+    for font in index.fonts:
+        line = f"  {font['key'][:16]:16} {font['glyphs']:6} glyphs  {font['name']}"
+        if args.text:
+            missing = index.missing(font["key"], args.text)
+            line += f"  missing: {missing!r}" if missing else "  complete"
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
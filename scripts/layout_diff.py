@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Layout-fidelity diff between an original PDF and its translation.
+Matches text blocks page by page through a grid-bucket spatial index and reports
+per-block displacement, overflow and missing content, plus the "Layout Fidelity"
+checks from docs/acceptance-checklist.md.
+"""
+
+import sys
+import json
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from pdf_source import open_pdf
+
+# Edge of a spatial index bucket, in points
+GRID_CELL_SIZE = 48.0
+
+# How far a translated block may have moved and still be matched (points)
+SEARCH_RADIUS = 72.0
+
+# A translated block overflows when it outgrows its original box by both amounts
+OVERFLOW_RATIO = 0.10
+OVERFLOW_POINTS = 2.0
+
+# Largest margin change per edge still considered "maintained" (points)
+MARGIN_TOLERANCE = 18.0
+
+# Largest shift of the left edge, right edge or center still considered aligned (points)
+ALIGNMENT_TOLERANCE = 3.0
+
+# Share of matched blocks that must keep their alignment anchor
+ALIGNMENT_PASS_RATIO = 0.9
+
+Box = Tuple[float, float, float, float]
+
+
+class GridIndex:
+    """Buckets boxes by the grid cells they touch, for neighbourhood queries."""
+
+    def __init__(self, boxes: List[Box], cell_size: float = GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.buckets = defaultdict(list)
+        for i, box in enumerate(boxes):
+            for cell in self._cells(box):
+                self.buckets[cell].append(i)
+
+    def _cells(self, box: Box):
+        x0, y0, x1, y1 = box
+        size = self.cell_size
+        for cx in range(math.floor(x0 / size), math.floor(x1 / size) + 1):
+            for cy in range(math.floor(y0 / size), math.floor(y1 / size) + 1):
+                yield cx, cy
+
+    def query(self, box: Box, margin: float = 0.0) -> Set[int]:
+        """Indices of boxes sharing a bucket with box grown by margin on every side."""
+        x0, y0, x1, y1 = box
+        found = set()
+        for cell in self._cells((x0 - margin, y0 - margin, x1 + margin, y1 + margin)):
+            found.update(self.buckets.get(cell, ()))
+        return found
+
+
+def extract_text_blocks(page) -> List[Box]:
+    """Bounding boxes of the non-empty text blocks on a page."""
+    return [
+        tuple(block[:4])
+        for block in page.get_text("blocks")
+        if block[6] == 0 and block[4].strip()
+    ]
+
+
+def _center(box: Box) -> Tuple[float, float]:
+    return (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+
+
+def _intersection(a: Box, b: Box) -> float:
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    return w * h if w > 0 and h > 0 else 0.0
+
+
+def _area(box: Box) -> float:
+    return max(box[2] - box[0], 0) * max(box[3] - box[1], 0)
+
+
+def _iou(a: Box, b: Box) -> float:
+    inter = _intersection(a, b)
+    union = _area(a) + _area(b) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_blocks(original: List[Box], translated: List[Box],
+                 search_radius: float = SEARCH_RADIUS) -> Dict[int, int]:
+    """Greedy one-to-one matching of original to translated blocks.
+
+    Candidates come from the spatial index, so each block is compared only
+    with its neighbours: the blocks overlapping it, or, if there are none,
+    those within search_radius. Pairs are ranked by center distance (relative
+    to the search radius) minus overlap, and accepted best-first.
+    """
+    index = GridIndex(translated)
+    candidates = []
+    for i, box in enumerate(original):
+        cx, cy = _center(box)
+        nearby = [j for j in index.query(box) if _intersection(box, translated[j]) > 0]
+        if not nearby:
+            nearby = index.query(box, search_radius)
+        for j in nearby:
+            tx, ty = _center(translated[j])
+            distance = math.hypot(tx - cx, ty - cy)
+            overlap = _iou(box, translated[j])
+            if distance > search_radius and overlap == 0:
+                continue
+            candidates.append((distance / search_radius - overlap, i, j))
+
+    candidates.sort()
+    matches = {}
+    used = set()
+    for _, i, j in candidates:
+        if i in matches or j in used:
+            continue
+        matches[i] = j
+        used.add(j)
+    return matches
+
+
+def _content_margins(blocks: List[Box], page_rect) -> Optional[List[float]]:
+    """Left, top, right, bottom distances from the page edges to the text."""
+    if not blocks:
+        return None
+    return [
+        min(b[0] for b in blocks) - page_rect.x0,
+        min(b[1] for b in blocks) - page_rect.y0,
+        page_rect.x1 - max(b[2] for b in blocks),
+        page_rect.y1 - max(b[3] for b in blocks),
+    ]
+
+
+def _overflows(original: Box, translated: Box) -> bool:
+    """Whether the translated block outgrew its original box."""
+    for size_orig, size_trans in ((original[2] - original[0], translated[2] - translated[0]),
+                                  (original[3] - original[1], translated[3] - translated[1])):
+        growth = size_trans - size_orig
+        if growth > OVERFLOW_POINTS and growth > OVERFLOW_RATIO * size_orig:
+            return True
+    return False
+
+
+def _alignment_anchor(original: Box, translated: Box) -> Optional[str]:
+    """Which horizontal anchor (left, right, center) the translation kept, if any."""
+    shifts = {
+        "left": abs(translated[0] - original[0]),
+        "right": abs(translated[2] - original[2]),
+        "center": abs(_center(translated)[0] - _center(original)[0]),
+    }
+    anchor = min(shifts, key=shifts.get)
+    return anchor if shifts[anchor] <= ALIGNMENT_TOLERANCE else None
+
+
+def _round_box(box: Box) -> List[float]:
+    return [round(v, 1) for v in box]
+
+
+def diff_page(original: List[Box], translated: List[Box], page_rect, page_number: int) -> Dict:
+    """Layout diff of one page pair."""
+    matches = match_blocks(original, translated)
+    translated_index = GridIndex(translated)
+    page_box = tuple(page_rect)
+
+    blocks = []
+    displacements = []
+    overflow = off_page = aligned = 0
+    for i, box in enumerate(original):
+        if i not in matches:
+            blocks.append({"original": _round_box(box), "translated": None, "status": "missing"})
+            continue
+
+        target = translated[matches[i]]
+        (ox, oy), (tx, ty) = _center(box), _center(target)
+        displacement = math.hypot(tx - ox, ty - oy)
+        displacements.append(displacement)
+
+        statuses = []
+        if _overflows(box, target):
+            statuses.append("overflow")
+            overflow += 1
+        if _intersection(target, page_box) < _area(target) - 1e-6:
+            statuses.append("off_page")
+            off_page += 1
+        anchor = _alignment_anchor(box, target)
+        if anchor:
+            aligned += 1
+
+        blocks.append({
+            "original": _round_box(box),
+            "translated": _round_box(target),
+            "dx": round(tx - ox, 1),
+            "dy": round(ty - oy, 1),
+            "displacement": round(displacement, 1),
+            "alignment": anchor,
+            "status": ",".join(statuses) or "ok",
+        })
+
+    # Translated blocks overlapping each other usually means text spilled out of its box
+    colliding = set()
+    for j, box in enumerate(translated):
+        for k in translated_index.query(box):
+            if k > j and _intersection(box, translated[k]) > 1.0:
+                colliding.update((j, k))
+    collisions = len(colliding)
+
+    orig_margins = _content_margins(original, page_rect)
+    trans_margins = _content_margins(translated, page_rect)
+    margin_deltas = None
+    if orig_margins and trans_margins:
+        margin_deltas = [round(t - o, 1) for o, t in zip(orig_margins, trans_margins)]
+
+    return {
+        "page_number": page_number,
+        "original_blocks": len(original),
+        "translated_blocks": len(translated),
+        "matched": len(matches),
+        "missing": len(original) - len(matches),
+        "extra": len(translated) - len(matches),
+        "overflow": overflow,
+        "off_page": off_page,
+        "collisions": collisions,
+        "aligned": aligned,
+        "mean_displacement": round(sum(displacements) / len(displacements), 1) if displacements else 0.0,
+        "max_displacement": round(max(displacements), 1) if displacements else 0.0,
+        "margin_deltas": margin_deltas,
+        "blocks": blocks,
+    }
+
+
+def diff_layout(original_path: str, translated_path: str) -> Dict:
+    """Layout-fidelity diff of two PDFs (paths or buffers), page by page."""
+    orig_doc = open_pdf(original_path)
+    trans_doc = open_pdf(translated_path)
+    try:
+        pages = []
+        for page_number in range(min(orig_doc.page_count, trans_doc.page_count)):
+            orig_page = orig_doc.load_page(page_number)
+            trans_page = trans_doc.load_page(page_number)
+            pages.append(diff_page(extract_text_blocks(orig_page), extract_text_blocks(trans_page),
+                                   orig_page.rect, page_number))
+        page_breaks_preserved = orig_doc.page_count == trans_doc.page_count
+    finally:
+        orig_doc.close()
+        trans_doc.close()
+
+    total = lambda key: sum(p[key] for p in pages)
+    original_blocks, matched = total("original_blocks"), total("matched")
+    margin_deltas = [abs(d) for p in pages if p["margin_deltas"] for d in p["margin_deltas"]]
+    summary = {
+        "original_blocks": original_blocks,
+        "translated_blocks": total("translated_blocks"),
+        "matched_ratio": matched / original_blocks if original_blocks else 1.0,
+        "missing_blocks": total("missing"),
+        "extra_blocks": total("extra"),
+        "overflowing_blocks": total("overflow"),
+        "off_page_blocks": total("off_page"),
+        "colliding_blocks": total("collisions"),
+        "aligned_ratio": total("aligned") / matched if matched else 1.0,
+        "max_margin_delta": max(margin_deltas) if margin_deltas else 0.0,
+    }
+
+    return {
+        "checks": {
+            "page_breaks_preserved": page_breaks_preserved,
+            "margins_maintained": summary["max_margin_delta"] <= MARGIN_TOLERANCE,
+            "no_text_overflow": summary["overflowing_blocks"] == 0 and summary["off_page_blocks"] == 0,
+            "alignment_preserved": summary["aligned_ratio"] >= ALIGNMENT_PASS_RATIO,
+        },
+        "summary": summary,
+        "pages": pages,
+    }
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python layout_diff.py <original_pdf> <translated_pdf>")
+        sys.exit(1)
+
+    print(json.dumps(diff_layout(sys.argv[1], sys.argv[2]), indent=2))
+
+
+if __name__ == "__main__":
+    main()
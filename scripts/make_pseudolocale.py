@@ -1,28 +1,433 @@
 #!/usr/bin/env python3
 """
-Placeholder for pseudolocale generator using PyMuPDF.
-This will be implemented to create pseudo-translated PDFs for testing.
+Pseudolocale generator using PyMuPDF.
+Rewrites every text span of the originals with a pseudo-translation profile, to
+exercise text expansion, accented glyphs, RTL layout and fullwidth forms without
+a real translation.
 """
 
+import fitz  # PyMuPDF
+import os
 import sys
+import math
+import shutil
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from glyph_coverage import DEFAULT_INDEX_DIR, GlyphCoverageIndex, subset_font_buffer
+
+REPO_ROOT = Path(__file__).parent.parent
+ORIGINALS_DIR = REPO_ROOT / "originals"
+OUTPUT_DIR = REPO_ROOT / "pseudolocale"
+
+# Documents longer than this are split into page-range jobs
+DEFAULT_PAGE_SHARD = 50
+
+# Target growth of ps-expand, as a share of the source length
+EXPANSION_RATIO = 0.4
+
+RIGHT_TO_LEFT_MARK = "\u200f"
+
+ACCENTS = str.maketrans(
+    "AaCcDdEeIiNnOoUuYyLlSsZzGgRrTt",
+    "ÅåÇçÐðÉéÎîÑñÖöÛûÝýĹĺŠšŽžĜĝŔŕŤť",
+)
+
+# Printable ASCII to its fullwidth form (U+FF01..U+FF5E), space to ideographic space
+FULLWIDTH = {code: code + 0xFEE0 for code in range(0x21, 0x7F)}
+FULLWIDTH[0x20] = 0x3000
+
+# Text extraction flags for span rewriting; leaves out image blocks and their pixel data
+SPAN_TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+
+def _accents(text: str) -> str:
+    return text.translate(ACCENTS)
+
+
+def _expand(text: str) -> str:
+    padding = max(1, math.ceil(len(text) * EXPANSION_RATIO) - 2)
+    return f"[{text.translate(ACCENTS)}{'~' * padding}]"
+
+
+def _rtl(text: str) -> str:
+    return RIGHT_TO_LEFT_MARK + text[::-1] + RIGHT_TO_LEFT_MARK
+
+
+def _fullwidth(text: str) -> str:
+    return text.translate(FULLWIDTH)
+
+
+# Built-in fonts tried, in order, for characters the profile font has no glyph for
+FALLBACK_FONTS = ("helv", "cjk")
+
+# Profile name -> (text transform, built-in font that renders it, right-aligned)
+PROFILES = {
+    "ps-accents": (_accents, "helv", False),
+    "ps-expand": (_expand, "helv", False),
+    "ps-rtl": (_rtl, "helv", True),
+    "ps-fullwidth": (_fullwidth, "cjk", False),
+}
+
+
+def output_name(source: Path, profile: str) -> Optional[str]:
+    """<category>.<src-lang>.<filename>.pdf -> <category>.<src-lang>.<profile>.psgen.<filename>.pdf"""
+    parts = source.name.split(".")
+    if len(parts) < 4 or parts[-1] != "pdf":
+        return None
+    category, src_lang, filename = parts[0], parts[1], ".".join(parts[2:-1])
+    return f"{category}.{src_lang}.{profile}.psgen.{filename}.pdf"
+
+
+def _redaction_options() -> Dict[str, int]:
+    """Remove text only; keep images and vector graphics (when this PyMuPDF supports it)."""
+    options = {"images": fitz.PDF_REDACT_IMAGE_NONE}
+    if hasattr(fitz, "PDF_REDACT_LINE_ART_NONE"):
+        options["graphics"] = fitz.PDF_REDACT_LINE_ART_NONE
+    return options
+
+
+def _iter_spans(page) -> Iterator[Tuple[Dict, Tuple[float, float]]]:
+    """Non-blank text spans of a page, with the writing direction of their line."""
+    text_dict = page.get_text("dict", flags=SPAN_TEXT_FLAGS)
+    for block in text_dict["blocks"]:
+        if block.get("type") != 0:
+            continue
+        for line in block["lines"]:
+            for span in line["spans"]:
+                if span["text"].strip():
+                    yield span, line["dir"]
+
+
+def _font_chain(profile: str) -> List[str]:
+    """Profile font first, then the fallbacks it does not already cover."""
+    font = PROFILES[profile][1]
+    return [font] + [key for key in FALLBACK_FONTS if key != font]
+
+
+def _load_font(fonts: Dict[str, fitz.Font], key: str) -> fitz.Font:
+    if key not in fonts:
+        fonts[key] = fitz.Font(key)
+    return fonts[key]
+
+
+def pseudolocalize_page(page, profile: str, index: GlyphCoverageIndex, fonts: Dict[str, fitz.Font],
+                        used_codepoints: Optional[Dict[str, Set[int]]] = None) -> int:
+    """Replace every text span on the page with its pseudo-translation.
+
+    All text is removed with a single page-sized redaction (one annotation per
+    span costs far more on dense pages), keeping images and vector graphics.
+    Each span is then rewritten at its original origin, size, color and direction,
+    split into runs by the first font of the profile's chain that has the glyphs.
+    fonts caches fitz.Font objects by key; used_codepoints collects, per font
+    key, the codepoints written. Returns the number of spans rewritten.
+    """
+    transform, _, right_aligned = PROFILES[profile]
+    chain = _font_chain(profile)
+    spans = list(_iter_spans(page))
+    if not spans:
+        return 0
+
+    page.add_redact_annot(page.rect, fill=False, cross_out=False)
+    page.apply_redactions(**_redaction_options())
+
+    # TextWriter applies one color and one rotation per write, so horizontal spans
+    # share a writer per color and visibility, and rotated spans get their own
+    writers = []
+    horizontal = {}
+    for span, (dx, dy) in spans:
+        runs = [(_load_font(fonts, key), key, run)
+                for key, run in index.fallback_runs(transform(span["text"]), chain)]
+        if not any(run.strip() for _, _, run in runs):
+            continue
+        fontsize = span["size"]
+        origin = fitz.Point(span["origin"])
+        if right_aligned:
+            x0, y0, x1, y1 = span["bbox"]
+            original_length = abs(dx) * (x1 - x0) + abs(dy) * (y1 - y0)
+            shift = original_length - sum(font.text_length(run, fontsize=fontsize) for font, _, run in runs)
+            origin = origin + (dx * shift, dy * shift)
+        invisible = span.get("alpha", 255) == 0  # OCR layers over scanned images
+        rotated = abs(dy) > 1e-3
+
+        key = (span["color"], invisible)
+        if rotated:
+            writer = fitz.TextWriter(page.rect)
+            morph = (origin, fitz.Matrix(-math.degrees(math.atan2(dy, dx))))
+            writers.append((writer, key, morph))
+        elif key in horizontal:
+            writer = horizontal[key]
+        else:
+            writer = horizontal[key] = fitz.TextWriter(page.rect)
+            writers.append((writer, key, None))
+        position = origin
+        for font, font_key, run in runs:
+            # Writers are unrotated until write_text, so runs continue along the x axis
+            _, position = writer.append(position, run, font=font, fontsize=fontsize)
+            if used_codepoints is not None:
+                used_codepoints.setdefault(font_key, set()).update(map(ord, run))
+
+    for writer, (color, invisible), morph in writers:
+        writer.write_text(page, color=fitz.sRGB_to_pdf(color), morph=morph,
+                          render_mode=3 if invisible else 0)
+    return len(spans)
+
+
+def _embedded_font_files(doc, page_numbers: Iterable[int], font: fitz.Font) -> Set[int]:
+    """Xrefs of the FontFile2 streams on the given pages that embed exactly this font."""
+    font_files = set()
+    seen = set()
+    for page_num in page_numbers:
+        for xref, _, subtype, basefont, *_ in doc.get_page_fonts(page_num):
+            if xref in seen or subtype != "Type0" or basefont != font.name:
+                continue
+            seen.add(xref)
+            kind, descendants = doc.xref_get_key(xref, "DescendantFonts")
+            if kind != "array":
+                continue
+            descendant = int(descendants.strip("[]").split()[0])
+            kind, descriptor = doc.xref_get_key(descendant, "FontDescriptor")
+            if kind != "xref":
+                continue
+            kind, font_file = doc.xref_get_key(int(descriptor.split()[0]), "FontFile2")
+            # Compare contents too: an original may embed its own font of the same name
+            if kind == "xref" and doc.xref_stream(int(font_file.split()[0])) == font.buffer:
+                font_files.add(int(font_file.split()[0]))
+    return font_files
+
+
+def subset_written_fonts(doc, page_numbers: Iterable[int], fonts: Dict[str, fitz.Font],
+                         used_codepoints: Dict[str, Set[int]]) -> int:
+    """Shrink the embedded TrueType fonts written by pseudolocalize_page to the codepoints used.
+
+    The codepoints come from the glyph lookups made while writing, so the
+    document text is not re-extracted. CFF fonts (helv) are left whole.
+    Returns the number of font files replaced.
+    """
+    page_numbers = list(page_numbers)
+    replaced = 0
+    for key, codepoints in used_codepoints.items():
+        font = fonts[key]
+        font_files = _embedded_font_files(doc, page_numbers, font)
+        if not font_files:
+            continue
+        subset = subset_font_buffer(font.buffer, codepoints)
+        if subset is None:
+            continue
+        for font_file in font_files:
+            doc.update_stream(font_file, subset)
+            doc.xref_set_key(font_file, "Length1", str(len(subset)))
+            replaced += 1
+    return replaced
+
+
+def _pseudolocalize_pages(doc, page_numbers: List[int], profile: str, index_dir: str) -> int:
+    """Rewrite the given pages in place and subset the fallback fonts written to them."""
+    # generate() built the index; a worker only reads it, so it never replaces a newer one
+    index = GlyphCoverageIndex.open(index_dir, save=False)
+    fonts = {}
+    used_codepoints = {}
+    spans = 0
+    for page_num in page_numbers:
+        spans += pseudolocalize_page(doc.load_page(page_num), profile, index, fonts, used_codepoints)
+    subset_written_fonts(doc, page_numbers, fonts, used_codepoints)
+    return spans
+
+
+def _pseudolocalize_range(source: str, profile: str, start: int, stop: int, dest: str,
+                          index_dir: str) -> int:
+    """Process pool job: rewrite pages [start, stop) of source and save them to dest."""
+    doc = fitz.open(source)
+    try:
+        spans = _pseudolocalize_pages(doc, list(range(start, stop)), profile, index_dir)
+        doc.select(list(range(start, stop)))
+        doc.save(dest, garbage=1, deflate=True)
+    finally:
+        doc.close()
+    return spans
+
+
+def _pseudolocalize_file(source: str, profile: str, dest: str, index_dir: str) -> int:
+    """Process pool job: rewrite a whole document in a copy of the source, saved incrementally."""
+    shutil.copyfile(source, dest)
+    doc = fitz.open(dest)
+    try:
+        spans = _pseudolocalize_pages(doc, list(range(doc.page_count)), profile, index_dir)
+        if doc.can_save_incrementally():
+            doc.saveIncr()
+        else:
+            # Repaired or encrypted files cannot take an incremental update
+            tmp_dest = dest + ".tmp"
+            doc.save(tmp_dest, garbage=1, deflate=True)
+            doc.close()
+            os.replace(tmp_dest, dest)
+    finally:
+        if not doc.is_closed:
+            doc.close()
+    return spans
+
+
+def _document_structure(doc) -> Tuple[List[List[Tuple[str, int]]], List]:
+    """Form widgets (name, type) per page and the outline: what a rewrite must keep."""
+    widgets = [[(widget.field_name, widget.field_type) for widget in page.widgets()] for page in doc]
+    return widgets, doc.get_toc(simple=False)
+
+
+def _merge_shards(source: str, dest: str, shard_paths: List[str]):
+    """Put the rewritten pages of page-range outputs, in order, back into a copy of the source.
+
+    Only each page's /Contents and /Resources come from the shards, so the
+    AcroForm, outline and annotations are the source's, as in an unsharded run.
+    Raises RuntimeError if the merged document lost form fields or outline entries.
+    """
+    doc = fitz.open(source)
+    try:
+        page_count = doc.page_count
+        for shard_path in shard_paths:
+            with fitz.open(shard_path) as shard:
+                doc.insert_pdf(shard, links=False, annots=False, widgets=False)
+        for page_num in range(page_count):
+            page_xref = doc.page_xref(page_num)
+            rewritten_xref = doc.page_xref(page_count + page_num)
+            for key in ("Contents", "Resources"):
+                kind, value = doc.xref_get_key(rewritten_xref, key)
+                if kind != "null":
+                    doc.xref_set_key(page_xref, key, value)
+        doc.delete_pages(range(page_count, doc.page_count))
+
+        with fitz.open(source) as original:
+            if _document_structure(doc) != _document_structure(original):
+                raise RuntimeError(f"Merging the shards of {dest} lost form fields or outline entries")
+        doc.save(dest, garbage=3, deflate=True)
+    finally:
+        doc.close()
+        for shard_path in shard_paths:
+            os.unlink(shard_path)
+
+
+def plan_jobs(sources: List[Path], profiles: List[str], output_dir: Path,
+              page_shard: int = DEFAULT_PAGE_SHARD) -> List[Tuple]:
+    """One job per (file, profile), or per page range for documents longer than page_shard."""
+    jobs = []
+    for source in sources:
+        with fitz.open(source) as doc:
+            page_count = doc.page_count
+        for profile in profiles:
+            name = output_name(source, profile)
+            if not name:
+                print(f"Skipping {source}: name does not follow <category>.<src-lang>.<filename>.pdf",
+                      file=sys.stderr)
+                break
+            dest = output_dir / name
+            if page_shard and page_count > page_shard:
+                ranges = [(start, min(start + page_shard, page_count))
+                          for start in range(0, page_count, page_shard)]
+            else:
+                ranges = None
+            jobs.append((str(source), profile, str(dest), ranges))
+    return jobs
+
+
+def _timed_job(func, *args):
+    """Process pool job: (func(*args), seconds it took in the worker)."""
+    start = time.perf_counter()
+    return func(*args), time.perf_counter() - start
+
+
+def _shard_path(dest: str, index: int) -> str:
+    return f"{dest}.part{index:04d}"
+
+
+def generate(sources: List[Path], profiles: List[str], output_dir: Path = OUTPUT_DIR,
+             workers: Optional[int] = None, page_shard: int = DEFAULT_PAGE_SHARD,
+             index_dir: Path = DEFAULT_INDEX_DIR, timings: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+    """Write every profile of every source, fanning files and page ranges out to a process pool.
+
+    The glyph-coverage index is built here, once, if missing; workers memory-map it.
+    A failed job is reported and its output left out; the other jobs carry on.
+    timings, if given, receives the seconds spent on each output written (its jobs plus the merge).
+    Returns the number of spans rewritten per output file written.
+    """
+    timings = {} if timings is None else timings
+    output_dir.mkdir(parents=True, exist_ok=True)
+    GlyphCoverageIndex.open(index_dir)
+    jobs = plan_jobs(sources, profiles, output_dir, page_shard)
+    results = {}
+    failed = set()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+            futures = {}
+            for source, profile, dest, ranges in jobs:
+                if ranges is None:
+                    futures[executor.submit(_timed_job, _pseudolocalize_file, source, profile, dest,
+                                            str(index_dir))] = (dest, None)
+                    continue
+                for index, (start, stop) in enumerate(ranges):
+                    futures[executor.submit(_timed_job, _pseudolocalize_range, source, profile, start, stop,
+                                            _shard_path(dest, index), str(index_dir))] = (dest, index)
+
+            shards = {dest: [None] * len(ranges) for _, _, dest, ranges in jobs if ranges}
+            sources = {dest: source for source, _, dest, _ in jobs}
+            for future in as_completed(futures):
+                dest, index = futures[future]
+                try:
+                    spans, seconds = future.result()
+                    results[dest] = results.get(dest, 0) + spans
+                    timings[dest] = timings.get(dest, 0.0) + seconds
+                    if index is None:
+                        print(f"Wrote {dest} ({spans} spans)")
+                        continue
+                    shards[dest][index] = _shard_path(dest, index)
+                    if all(shards[dest]) and dest not in failed:
+                        start = time.perf_counter()
+                        _merge_shards(sources[dest], dest, shards[dest])
+                        timings[dest] += time.perf_counter() - start
+                        print(f"Wrote {dest} ({results[dest]} spans, {len(shards[dest])} shards)")
+                except Exception as e:
+                    failed.add(dest)
+                    where = "" if index is None else f" (shard {index})"
+                    print(f"Error generating {dest}{where}: {type(e).__name__}: {e}", file=sys.stderr)
+                    if index is None:
+                        # A whole-file job works on a copy at dest; do not leave it looking finished
+                        for path in (dest, dest + ".tmp"):
+                            Path(path).unlink(missing_ok=True)
+    finally:
+        # Shards of failed or interrupted documents (merged ones are already gone)
+        for _, _, dest, ranges in jobs:
+            for index in range(len(ranges or ())):
+                Path(_shard_path(dest, index)).unlink(missing_ok=True)
+
+    if failed:
+        print(f"{len(failed)} output(s) failed", file=sys.stderr)
+        for dest in failed:
+            timings.pop(dest, None)
+    return {dest: spans for dest, spans in results.items() if dest not in failed}
+
 
 def main():
-    print("Pseudolocale generator placeholder")
-    print("This script will generate pseudo-translated PDFs using PyMuPDF")
-    print("Implementation pending...")
-    
-    print("\nPlanned pseudolocale profiles:")
-    print("- ps-accents: Replace ASCII with accented characters")
-    print("- ps-expand: Add 30-50% text expansion")  
-    print("- ps-rtl: Simulate RTL with reversed text and bidi marks")
-    print("- ps-fullwidth: Convert to fullwidth Unicode forms")
-    
-    print("\nExpected file structure:")
-    print("- Input: originals/<category>.<src-lang>.<filename>.pdf")
-    print("- Output: pseudolocale/<category>.<src-lang>.<pseudo-locale>.psgen.<filename>.pdf")
-    
+    parser = argparse.ArgumentParser(description="Generate pseudo-translated PDFs")
+    parser.add_argument('pdf_files', nargs='*', type=Path,
+                        help='Originals to pseudolocalize (default: every PDF in originals/)')
+    parser.add_argument('--profile', action='append', choices=sorted(PROFILES),
+                        help='Profile to generate (repeatable, default: all)')
+    parser.add_argument('--output-dir', type=Path, default=OUTPUT_DIR, help='Where to write the outputs')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--page-shard', type=int, default=DEFAULT_PAGE_SHARD,
+                        help='Split documents longer than this many pages into page-range jobs (0: never)')
+    parser.add_argument('--index-dir', type=Path, default=DEFAULT_INDEX_DIR,
+                        help='Where the glyph-coverage index is stored')
+
+    args = parser.parse_args()
+
+    sources = args.pdf_files or sorted(ORIGINALS_DIR.glob("*.pdf"))
+    profiles = args.profile or list(PROFILES)
+    generate(sources, profiles, args.output_dir, args.workers, args.page_shard, args.index_dir)
     return 0
 
+
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
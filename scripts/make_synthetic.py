@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Synthetic large-document generator for scale and stress testing.
+Writes deterministic PDFs of a chosen size and mix: text pages, heavy vector
+drawings, form widgets, full-page scans and image XObjects shared across pages.
+Objects are streamed straight to the output file as they are generated; only
+object offsets and page/field references are kept, so memory does not grow
+with page content and thousands of pages can be written offline.
+
+Output goes to synthetic/<scenario>.en.synthetic-<pages>p.pdf, the same
+<category>.<lang>.<name>.pdf convention as originals/.
+"""
+
+import sys
+import zlib
+import random
+import hashlib
+import argparse
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+import fitz  # PyMuPDF, for JPEG-encoding scan pages
+import numpy as np
+
+REPO_ROOT = Path(__file__).parent.parent
+DEFAULT_OUTPUT_DIR = REPO_ROOT / "synthetic"
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # US Letter, in points
+MARGIN = 54
+
+# Page mix per scenario; --pages and the other flags override single fields
+SCENARIOS = {
+    "book": {"pages": 2000, "text_lines": 44},
+    "vector": {"pages": 500, "text_lines": 8, "drawings": 400},
+    "forms": {"pages": 200, "text_lines": 6, "widgets": 40},
+    "scanned": {"pages": 300, "scan": True},
+    "catalog": {"pages": 1000, "text_lines": 12, "images": 6, "image_pool": 24},
+    "mixed": {"pages": 1000, "text_lines": 20, "drawings": 40, "widgets": 4, "images": 2, "image_pool": 8},
+}
+DEFAULT_LAYOUT = {"pages": 100, "text_lines": 0, "drawings": 0, "widgets": 0, "images": 0, "image_pool": 0,
+                  "scan": False}
+
+# Scan pages: raster resolution and JPEG-encoded grayscale, like a real scanner's output
+SCAN_DPI = 100
+# Edge of the square RGB images in the shared pool
+POOL_IMAGE_SIZE = 256
+
+WORDS = ("analysis", "document", "translation", "layout", "paragraph", "section", "table", "figure",
+         "provider", "original", "page", "the", "of", "and", "to", "in", "a", "is", "for", "with",
+         "render", "font", "embedded", "glyph", "scale", "stress", "corpus", "sample", "value", "field")
+
+
+class StreamingPDFWriter:
+    """Minimal PDF writer that emits each object as soon as it is complete.
+
+    Object numbers are allocated up front (reserve), so a page can refer to its
+    annotations and they to it before either is written.
+    """
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.offsets = [0]  # offsets[n] is the byte offset of object n
+        self.f.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def reserve(self) -> int:
+        self.offsets.append(0)
+        return len(self.offsets) - 1
+
+    def write(self, number: int, body: bytes, stream: Optional[bytes] = None):
+        self.offsets[number] = self.f.tell()
+        self.f.write(b"%d 0 obj\n" % number)
+        if stream is None:
+            self.f.write(body)
+        else:
+            self.f.write(body[:-2] + b" /Length %d >>\nstream\n" % len(stream))  # body ends with ">>"
+            self.f.write(stream)
+            self.f.write(b"\nendstream")
+        self.f.write(b"\nendobj\n")
+
+    def add(self, body: bytes, stream: Optional[bytes] = None) -> int:
+        number = self.reserve()
+        self.write(number, body, stream)
+        return number
+
+    def finish(self, root: int, info: int, file_id: bytes):
+        xref = self.f.tell()
+        self.f.write(b"xref\n0 %d\n0000000000 65535 f \n" % len(self.offsets))
+        self.f.write(b"".join(b"%010d 00000 n \n" % offset for offset in self.offsets[1:]))
+        self.f.write(b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R /ID [<%s> <%s>] >>\n"
+                     % (len(self.offsets), root, info, file_id.hex().encode(), file_id.hex().encode()))
+        self.f.write(b"startxref\n%d\n%%%%EOF\n" % xref)
+
+
+def _text_ops(rng: random.Random, lines: int, page_number: int) -> List[bytes]:
+    ops = [b"BT /F1 9 Tf 12 TL %d %d Td" % (MARGIN, PAGE_HEIGHT - MARGIN)]
+    ops.append(b"(Synthetic page %d) Tj T*" % (page_number + 1))
+    for _ in range(lines):
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 14)))
+        ops.append(b"(%s) Tj T*" % words.encode("ascii"))
+    ops.append(b"ET")
+    return ops
+
+
+def _drawing_ops(rng: random.Random, count: int) -> List[bytes]:
+    """Strokes, filled rectangles and Bezier curves, the way charts and CAD exports pile them up."""
+    ops = []
+    for i in range(count):
+        x, y = rng.uniform(MARGIN, PAGE_WIDTH - MARGIN), rng.uniform(MARGIN, PAGE_HEIGHT - MARGIN)
+        r, g, b = rng.random(), rng.random(), rng.random()
+        kind = i % 3
+        if kind == 0:
+            ops.append(b"%.3f %.3f %.3f RG %.2f w %.1f %.1f m %.1f %.1f l S"
+                       % (r, g, b, rng.uniform(0.2, 2), x, y, x + rng.uniform(-80, 80), y + rng.uniform(-80, 80)))
+        elif kind == 1:
+            ops.append(b"%.3f %.3f %.3f rg %.1f %.1f %.1f %.1f re f"
+                       % (r, g, b, x, y, rng.uniform(2, 40), rng.uniform(2, 40)))
+        else:
+            ops.append(b"%.3f %.3f %.3f RG %.1f %.1f m %.1f %.1f %.1f %.1f %.1f %.1f c S"
+                       % (r, g, b, x, y, x + rng.uniform(-60, 60), y + rng.uniform(-60, 60),
+                          x + rng.uniform(-60, 60), y + rng.uniform(-60, 60),
+                          x + rng.uniform(-60, 60), y + rng.uniform(-60, 60)))
+    return ops
+
+
+def _pool_image(rng: np.random.Generator, index: int) -> bytes:
+    """A distinct RGB gradient-and-noise tile, Flate-compressed."""
+    axis = np.linspace(0, 255, POOL_IMAGE_SIZE)
+    tile = np.empty((POOL_IMAGE_SIZE, POOL_IMAGE_SIZE, 3), dtype=np.uint8)
+    tile[..., 0] = (axis[None, :] + index * 37) % 256
+    tile[..., 1] = (axis[:, None] + index * 71) % 256
+    tile[..., 2] = rng.integers(0, 256, (POOL_IMAGE_SIZE, POOL_IMAGE_SIZE))
+    return zlib.compress(tile.tobytes(), 6)
+
+
+def _scan_image(rng: np.random.Generator) -> bytes:
+    """A full-page grayscale 'scan': paper noise plus dark bars where text lines would be, as JPEG."""
+    width, height = PAGE_WIDTH * SCAN_DPI // 72, PAGE_HEIGHT * SCAN_DPI // 72
+    pixels = rng.normal(238, 6, (height, width))
+    line_height = SCAN_DPI // 6
+    for top in range(MARGIN * SCAN_DPI // 72, height - MARGIN * SCAN_DPI // 72, line_height):
+        right = int(width - MARGIN * SCAN_DPI // 72 - rng.integers(0, width // 3))
+        pixels[top:top + line_height // 2, MARGIN * SCAN_DPI // 72:right] -= rng.uniform(120, 180)
+    pixels = np.clip(pixels, 0, 255).astype(np.uint8)
+    return fitz.Pixmap(fitz.csGRAY, width, height, pixels.tobytes(), 0).tobytes("jpeg")
+
+
+def _widgets(writer: StreamingPDFWriter, rng: random.Random, page_ref: int, page_number: int,
+             count: int) -> List[int]:
+    """Text fields and checkboxes in a grid down the right half of the page."""
+    refs = []
+    for i in range(count):
+        col, row = i % 2, i // 2
+        x0 = PAGE_WIDTH / 2 + col * 120
+        y1 = PAGE_HEIGHT - MARGIN - row * 18
+        name = b"p%d_f%d" % (page_number + 1, i)
+        if i % 4 == 3:
+            rect = b"[%.1f %.1f %.1f %.1f]" % (x0, y1 - 12, x0 + 12, y1)
+            state = b"/Yes" if rng.random() < 0.5 else b"/Off"
+            body = (b"<< /Type /Annot /Subtype /Widget /FT /Btn /T (%s) /Rect %s /P %d 0 R /F 4 "
+                    b"/V %s /AS %s /MK << /CA (4) >> /DA (/ZaDb 0 Tf 0 g) >>" % (name, rect, page_ref, state, state))
+        else:
+            rect = b"[%.1f %.1f %.1f %.1f]" % (x0, y1 - 14, x0 + 110, y1)
+            value = rng.choice(WORDS).encode("ascii")
+            body = (b"<< /Type /Annot /Subtype /Widget /FT /Tx /T (%s) /Rect %s /P %d 0 R /F 4 "
+                    b"/V (%s) /DA (/Helv 9 Tf 0 g) >>" % (name, rect, page_ref, value))
+        refs.append(writer.add(body))
+    return refs
+
+
+def write_synthetic(output_path: Path, layout: Dict, seed: int = 0) -> Dict:
+    """Write one synthetic PDF with the given layout and return what it contains."""
+    layout = dict(DEFAULT_LAYOUT, **layout)
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+
+    with open(tmp_path, "wb") as f:
+        writer = StreamingPDFWriter(f)
+        catalog, pages_root = writer.reserve(), writer.reserve()
+        helv = writer.add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        zadb = writer.add(b"<< /Type /Font /Subtype /Type1 /BaseFont /ZapfDingbats >>")
+
+        pool = [writer.add(b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB "
+                           b"/BitsPerComponent 8 /Filter /FlateDecode >>" % (POOL_IMAGE_SIZE, POOL_IMAGE_SIZE),
+                           _pool_image(np_rng, i))
+                for i in range(layout["image_pool"] if layout["images"] else 0)]
+
+        page_refs = []
+        field_refs = []
+        for page_number in range(layout["pages"]):
+            page_ref = writer.reserve()
+            xobjects = {}
+            ops = []
+            if layout["scan"]:
+                scan = writer.add(b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+                                  b"/BitsPerComponent 8 /Filter /DCTDecode >>"
+                                  % (PAGE_WIDTH * SCAN_DPI // 72, PAGE_HEIGHT * SCAN_DPI // 72), _scan_image(np_rng))
+                xobjects[b"Scan"] = scan
+                ops.append(b"q %d 0 0 %d 0 0 cm /Scan Do Q" % (PAGE_WIDTH, PAGE_HEIGHT))
+            for i in range(layout["images"] if pool else 0):
+                name = b"Im%d" % i
+                xobjects[name] = pool[rng.randrange(len(pool))]
+                size = rng.uniform(60, 140)
+                ops.append(b"q %.1f 0 0 %.1f %.1f %.1f cm /%s Do Q"
+                           % (size, size, rng.uniform(MARGIN, PAGE_WIDTH - MARGIN - size),
+                              rng.uniform(MARGIN, PAGE_HEIGHT - MARGIN - size), name))
+            ops.extend(_drawing_ops(rng, layout["drawings"]))
+            if layout["text_lines"]:
+                ops.extend(_text_ops(rng, layout["text_lines"], page_number))
+            content = writer.add(b"<< /Filter /FlateDecode >>", zlib.compress(b"\n".join(ops), 6))
+
+            annots = _widgets(writer, rng, page_ref, page_number, layout["widgets"])
+            field_refs.extend(annots)
+            resources = b"<< /Font << /F1 %d 0 R >>" % helv
+            if xobjects:
+                resources += b" /XObject << %s >>" % b" ".join(b"/%s %d 0 R" % (name, ref)
+                                                              for name, ref in xobjects.items())
+            resources += b" >>"
+            annots_entry = b" /Annots [%s]" % b" ".join(b"%d 0 R" % ref for ref in annots) if annots else b""
+            writer.write(page_ref, b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources %s "
+                                   b"/Contents %d 0 R%s >>"
+                         % (pages_root, PAGE_WIDTH, PAGE_HEIGHT, resources, content, annots_entry))
+            page_refs.append(page_ref)
+
+        writer.write(pages_root, b"<< /Type /Pages /Count %d /Kids [%s] >>"
+                     % (len(page_refs), b" ".join(b"%d 0 R" % ref for ref in page_refs)))
+        acroform = b""
+        if field_refs:
+            acroform = (b" /AcroForm << /Fields [%s] /NeedAppearances true /DA (/Helv 0 Tf 0 g) "
+                        b"/DR << /Font << /Helv %d 0 R /ZaDb %d 0 R >> >> >>"
+                        % (b" ".join(b"%d 0 R" % ref for ref in field_refs), helv, zadb))
+        writer.write(catalog, b"<< /Type /Catalog /Pages %d 0 R%s >>" % (pages_root, acroform))
+        info = writer.add(b"<< /Title (Synthetic %s) /Producer (documentbot make_synthetic.py) "
+                          b"/CreationDate (D:20240101000000Z) /ModDate (D:20240101000000Z) >>"
+                          % output_path.stem.encode("ascii", "replace"))
+        # Derived from the inputs, so the same layout and seed give byte-identical files
+        file_id = hashlib.md5(repr((sorted(layout.items()), seed)).encode()).digest()
+        writer.finish(catalog, info, file_id)
+        size = f.tell()
+    tmp_path.replace(output_path)
+
+    return {"path": str(output_path), "pages": len(page_refs), "fields": len(field_refs),
+            "pool_images": len(pool), "bytes": size}
+
+
+def output_name(scenario: str, pages: int) -> str:
+    return f"{scenario}.en.synthetic-{pages}p.pdf"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic PDFs for scale testing")
+    parser.add_argument('--scenario', '-s', action='append', choices=SCENARIOS,
+                        help='Scenario to generate (repeatable, default: all)')
+    parser.add_argument('--output-dir', '-o', type=Path, default=DEFAULT_OUTPUT_DIR, help='Output directory')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives identical files')
+    parser.add_argument('--pages', type=int, help='Page count (overrides the scenario)')
+    parser.add_argument('--text-lines', type=int, help='Text lines per page')
+    parser.add_argument('--drawings', type=int, help='Vector drawing operations per page')
+    parser.add_argument('--widgets', type=int, help='Form widgets per page')
+    parser.add_argument('--images', type=int, help='Shared images placed on each page')
+    parser.add_argument('--image-pool', type=int, help='Distinct image XObjects the placed images come from')
+    parser.add_argument('--scan', action='store_true', default=None, help='Give every page a full-page scan image')
+
+    args = parser.parse_args()
+
+    overrides = {name: getattr(args, name) for name in DEFAULT_LAYOUT if getattr(args, name) is not None}
+    if overrides.get("images") and not overrides.get("image_pool"):
+        overrides.setdefault("image_pool", overrides["images"])
+    for scenario in args.scenario or list(SCENARIOS):
+        layout = {**DEFAULT_LAYOUT, **SCENARIOS[scenario], **overrides}
+        result = write_synthetic(args.output_dir / output_name(scenario, layout["pages"]), layout, args.seed)
+        print(f"{result['path']}: {result['pages']} pages, {result['fields']} fields, "
+              f"{result['pool_images']} shared images, {result['bytes'] / (1024 * 1024):.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
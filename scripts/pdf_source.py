@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+PDF sources: a filesystem path or an in-memory buffer.
+Buffers (bytes, bytearray, memoryview, mmap) are wrapped in a memoryview and
+handed to fitz.open(stream=...), which reads them in place, so a document
+received over the network is analyzed without a copy or a disk round-trip.
+"""
+
+import mmap
+from pathlib import Path
+from typing import Union
+
+import fitz  # PyMuPDF
+
+PDFSource = Union[str, Path, bytes, bytearray, memoryview, mmap.mmap]
+
+# Display name of documents opened from a buffer without a name
+BUFFER_NAME = "memory.pdf"
+
+
+def is_buffer(source) -> bool:
+    return isinstance(source, (bytes, bytearray, memoryview, mmap.mmap))
+
+
+def as_view(source) -> memoryview:
+    """A zero-copy byte view of a buffer source.
+
+    PyMuPDF copies bytearrays and rejects mmaps, but reads memoryviews in place.
+    """
+    view = source if isinstance(source, memoryview) else memoryview(source)
+    return view if view.format == "B" and view.ndim == 1 else view.cast("B")
+
+
+def open_pdf(source) -> fitz.Document:
+    """Open a path, or a buffer without copying it."""
+    if is_buffer(source):
+        return fitz.open(stream=as_view(source), filetype="pdf")
+    return fitz.open(source)
+
+
+def source_size(source) -> int:
+    """Size in bytes: the buffer length, or the file size on disk."""
+    if is_buffer(source):
+        return as_view(source).nbytes
+    return Path(source).stat().st_size
+
+
+def source_name(source) -> str:
+    return BUFFER_NAME if is_buffer(source) else Path(source).name
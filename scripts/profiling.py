@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Timing instrumentation and opt-in profilers for PDFAnalyzer.
+SectionTimer accumulates elapsed time, call counts and returned item counts
+per named section; NullTimer has the same interface and only forwards calls,
+so an uninstrumented analysis pays one extra function call per step.
+"""
+
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, Optional
+
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+# Allocation sites listed in a tracemalloc report
+TRACEMALLOC_TOP = 40
+
+
+class SectionTimer:
+    """Elapsed seconds, calls and items (length of list results) per section, in first-use order."""
+
+    def __init__(self):
+        self.sections = {}
+
+    def call(self, name: str, func: Callable, *args, **kwargs) -> Any:
+        """Call func and charge its time to section name."""
+        start = perf_counter()
+        result = func(*args, **kwargs)
+        self.add(name, perf_counter() - start, len(result) if isinstance(result, list) else 0)
+        return result
+
+    def add(self, name: str, seconds: float, items: int = 0):
+        entry = self.sections.get(name)
+        if entry is None:
+            entry = self.sections[name] = [0, 0.0, 0]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += items
+
+    def merge(self, other: "SectionTimer"):
+        for name, (calls, seconds, items) in other.sections.items():
+            entry = self.sections.setdefault(name, [0, 0.0, 0])
+            entry[0] += calls
+            entry[1] += seconds
+            entry[2] += items
+
+    def result(self) -> Dict[str, Dict]:
+        return {
+            name: {"calls": calls, "seconds": round(seconds, 6), "items": items}
+            for name, (calls, seconds, items) in self.sections.items()
+        }
+
+
+class NullTimer:
+    """SectionTimer stand-in for uninstrumented runs."""
+
+    def call(self, name: str, func: Callable, *args, **kwargs) -> Any:
+        return func(*args, **kwargs)
+
+    def add(self, name: str, seconds: float, items: int = 0):
+        pass
+
+    def merge(self, other):
+        pass
+
+    def result(self) -> Dict[str, Dict]:
+        return {}
+
+
+@contextmanager
+def capture_profile(mode: Optional[str], output_stem: Path) -> Iterator[None]:
+    """Profile the block into <output_stem>.prof (cprofile) or <output_stem>.tracemalloc.txt.
+
+    With mode None the block runs unprofiled.
+    """
+    if mode is None:
+        yield
+        return
+
+    output_stem = Path(output_stem)
+    output_stem.parent.mkdir(parents=True, exist_ok=True)
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f"{output_stem}.prof")
+    elif mode == "tracemalloc":
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if not already_tracing:
+                tracemalloc.stop()
+            with open(f"{output_stem}.tracemalloc.txt", "w") as f:
+                f.write(f"current: {current} bytes, peak: {peak} bytes\n")
+                for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]:
+                    f.write(f"{stat}\n")
+    else:
+        raise ValueError(f"Unknown profile mode: {mode}")
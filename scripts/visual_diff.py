@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Visual diff between an original PDF and its translation.
+Renders matching pages in grayscale at a low DPI, spread across worker
+processes, and compares them with vectorized NumPy metrics: SSIM, a
+changed-pixel mask and perceptual hashes. The text areas of both pages are
+masked out of the graphics metrics, so replaced text does not hide a lost logo,
+image or background. Rendered pages are cached by a hash of the page's own
+content and the DPI, so re-runs skip rendering any page that did not change. Backs the "Visual Elements" checks in
+docs/acceptance-checklist.md.
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import hashlib
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from analysis_cache import evict_lru
+from coverage_grid import occupancy_counts, region_density
+from pdf_source import is_buffer, open_pdf
+
+REPO_ROOT = Path(__file__).parent.parent
+DEFAULT_THUMBNAIL_DIR = REPO_ROOT / ".cache" / "thumbnails"
+DEFAULT_THUMBNAIL_MAX_BYTES = 256 * 1024 * 1024
+
+# Bump when the rendering or the cached arrays change
+THUMBNAIL_VERSION = 2
+
+# Indirect references in an object definition ("12 0 R")
+OBJECT_REF = re.compile(r"\b(\d+) \d+ R\b")
+
+DEFAULT_DPI = 36
+
+# SSIM window edge in pixels, and the usual stabilising constants for 8-bit images
+SSIM_WINDOW = 7
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+
+# Gray-level difference above which a pixel counts as changed
+CHANGE_THRESHOLD = 48
+
+# Perceptual hashes: pHash keeps the 8x8 lowest frequencies of a 32x32 DCT; aHash and dHash are 8x8
+PHASH_SIZE = 32
+HASH_SIZE = 8
+
+# Visual Elements pass marks, over the graphics (non-text) pixels of every page
+GRAPHICS_SSIM_PASS = 0.9
+GRAPHICS_CHANGE_PASS = 0.05
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """Orthonormal DCT-II matrix, so D @ x @ D.T is the 2D DCT of x."""
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * math.sqrt(2 / size)
+    matrix[0] /= math.sqrt(2)
+    return matrix
+
+
+DCT_MATRIX = _dct_matrix(PHASH_SIZE)
+
+
+class ThumbnailCache:
+    """Size-bounded LRU store of rendered pages: grayscale pixels plus text boxes in pixel units.
+
+    Entries are .npz files keyed by the page content hash (page_content_sha256) and DPI,
+    so the same original rendered for several providers is rendered once, and
+    an edited document only re-renders the pages that changed.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_THUMBNAIL_DIR, max_bytes: int = DEFAULT_THUMBNAIL_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key_for(page_sha256: str, dpi: int) -> str:
+        return f"{page_sha256}-{dpi}dpi-v{THUMBNAIL_VERSION}"
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.npz"
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        entry = self._entry_path(key)
+        try:
+            with np.load(entry, allow_pickle=False) as arrays:
+                thumbnail = arrays["pixels"], arrays["text_boxes"]
+        except (FileNotFoundError, ValueError, KeyError, OSError):
+            return None
+        try:
+            os.utime(entry)  # Mark as recently used
+        except OSError:
+            pass
+        return thumbnail
+
+    def put(self, key: str, pixels: np.ndarray, text_boxes: np.ndarray):
+        """Store a page atomically; call evict() once a batch of puts is done."""
+        entry = self._entry_path(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=entry.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, pixels=pixels, text_boxes=text_boxes)
+            os.replace(tmp_path, entry)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def evict(self):
+        evict_lru(self.cache_dir, "*/*.npz", self.max_bytes)
+
+
+def _object_digest(doc, xref: int, digests: Dict[int, Tuple[bytes, List[int]]]) -> Tuple[bytes, List[int]]:
+    """SHA-256 of one object's definition and raw stream, and the objects it references (memoized)."""
+    if xref not in digests:
+        definition = doc.xref_object(xref, compressed=True)
+        digest = hashlib.sha256(definition.encode())
+        if doc.xref_is_stream(xref):
+            digest.update(doc.xref_stream_raw(xref) or b"")
+        refs = [int(ref) for ref in OBJECT_REF.findall(definition)]
+        digests[xref] = digest.digest(), [ref for ref in refs if 0 < ref < doc.xref_length()]
+    return digests[xref]
+
+
+def page_content_sha256(page, digests: Optional[Dict[int, Tuple[bytes, List[int]]]] = None) -> str:
+    """SHA-256 of everything a page renders from: its boxes and rotation, content streams,
+    resources (inherited ones included) and annotations, followed through indirect references.
+
+    Other pages and the page tree are not followed, so a page keeps its hash when the
+    rest of the document changes. Pass the same digests dict for pages of one
+    document to hash shared fonts and images once.
+    """
+    doc = page.parent
+    digests = {} if digests is None else digests
+    hasher = hashlib.sha256(f"{tuple(page.mediabox)} {tuple(page.cropbox)} {page.rotation}".encode())
+    pending = [page.xref]
+    # Resources inherited from an ancestor in the page tree
+    node = page.xref
+    while doc.xref_get_key(node, "Resources")[0] == "null":
+        kind, parent = doc.xref_get_key(node, "Parent")
+        if kind != "xref":
+            break
+        node = int(parent.split()[0])
+    if node != page.xref:
+        resources = doc.xref_get_key(node, "Resources")[1]
+        hasher.update(resources.encode())
+        pending.extend(int(ref) for ref in reversed(OBJECT_REF.findall(resources)))
+    seen = set()
+    while pending:
+        xref = pending.pop()
+        if xref in seen:
+            continue
+        seen.add(xref)
+        if xref != page.xref and doc.xref_get_key(xref, "Type")[1] in ("/Page", "/Pages"):
+            continue  # Link targets and the page tree
+        digest, refs = _object_digest(doc, xref, digests)
+        hasher.update(digest)
+        pending.extend(reversed(refs))
+    return hasher.hexdigest()
+
+
+def render_page(page, dpi: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Grayscale pixels of a page, and its text block boxes in the same pixel space."""
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width].copy()
+    # Text coordinates are unrotated; the pixmap is rotated and scaled
+    matrix = page.rotation_matrix * fitz.Matrix(dpi / 72, dpi / 72)
+    boxes = [tuple(fitz.Rect(block[:4]) * matrix) for block in page.get_text("blocks") if block[6] == 0]
+    return pixels, np.array(boxes, dtype=np.float32).reshape(-1, 4)
+
+
+class _PageSource:
+    """Thumbnails of one document's pages, from the cache or rendered."""
+
+    def __init__(self, source, dpi: int, cache: Optional[ThumbnailCache]):
+        self.doc = open_pdf(source)
+        self.dpi = dpi
+        self.cache = cache
+        self.digests = {}
+        self.rendered = 0
+
+    def get(self, page_number: int) -> Tuple[np.ndarray, np.ndarray]:
+        page = self.doc.load_page(page_number)
+        key = ThumbnailCache.key_for(page_content_sha256(page, self.digests), self.dpi) if self.cache else None
+        thumbnail = self.cache.get(key) if self.cache else None
+        if thumbnail is None:
+            thumbnail = render_page(page, self.dpi)
+            self.rendered += 1
+            if self.cache:
+                self.cache.put(key, *thumbnail)
+        return thumbnail
+
+    def close(self):
+        self.doc.close()
+
+
+def _text_mask(boxes: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    return occupancy_counts(boxes, (0, 0, shape[1], shape[0])) > 0
+
+
+def _resample(pixels: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    """Nearest-neighbour resize (for pages whose size changed, and images smaller than a hash grid)."""
+    rows = np.arange(shape[0]) * pixels.shape[0] // shape[0]
+    cols = np.arange(shape[1]) * pixels.shape[1] // shape[1]
+    return pixels[rows[:, None], cols[None, :]]
+
+
+def _downsample(pixels: np.ndarray, rows: int, cols: int) -> np.ndarray:
+    """Area-average an image down to rows x cols."""
+    if pixels.shape[0] < rows or pixels.shape[1] < cols:
+        pixels = _resample(pixels, (max(rows, pixels.shape[0]), max(cols, pixels.shape[1])))
+    row_edges = np.linspace(0, pixels.shape[0], rows + 1).astype(np.intp)
+    col_edges = np.linspace(0, pixels.shape[1], cols + 1).astype(np.intp)
+    sums = np.add.reduceat(np.add.reduceat(pixels.astype(np.float64), row_edges[:-1], axis=0),
+                           col_edges[:-1], axis=1)
+    return sums / np.outer(np.diff(row_edges), np.diff(col_edges))
+
+
+def perceptual_hashes(pixels: np.ndarray) -> Dict[str, np.ndarray]:
+    """64-bit average, difference and DCT hashes of an image, as boolean arrays."""
+    small = _downsample(pixels, HASH_SIZE, HASH_SIZE)
+    wide = _downsample(pixels, HASH_SIZE, HASH_SIZE + 1)
+    low = (DCT_MATRIX @ _downsample(pixels, PHASH_SIZE, PHASH_SIZE) @ DCT_MATRIX.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    return {
+        "ahash": (small > small.mean()).ravel(),
+        "dhash": (wide[:, 1:] > wide[:, :-1]).ravel(),
+        "phash": low > np.median(low[1:]),  # The DC term would dominate the median
+    }
+
+
+def _box_mean(image: np.ndarray, size: int) -> np.ndarray:
+    """Mean over a size x size window around every pixel, from an integral image."""
+    padded = np.pad(image, size // 2, mode="edge")
+    integral = np.pad(padded.cumsum(axis=0).cumsum(axis=1), ((1, 0), (1, 0)))
+    return (integral[size:, size:] - integral[:-size, size:] - integral[size:, :-size]
+            + integral[:-size, :-size]) / (size * size)
+
+
+def ssim_map(a: np.ndarray, b: np.ndarray, window: int = SSIM_WINDOW) -> np.ndarray:
+    """Per-pixel structural similarity of two same-sized grayscale images."""
+    a = a.astype(np.float64)
+    b = b.astype(np.float64)
+    mu_a, mu_b = _box_mean(a, window), _box_mean(b, window)
+    var_a = _box_mean(a * a, window) - mu_a * mu_a
+    var_b = _box_mean(b * b, window) - mu_b * mu_b
+    cov = _box_mean(a * b, window) - mu_a * mu_b
+    return (((2 * mu_a * mu_b + SSIM_C1) * (2 * cov + SSIM_C2))
+            / ((mu_a * mu_a + mu_b * mu_b + SSIM_C1) * (var_a + var_b + SSIM_C2)))
+
+
+def diff_page_pixels(original: Tuple[np.ndarray, np.ndarray], translated: Tuple[np.ndarray, np.ndarray],
+                     page_number: int, dpi: int) -> Dict:
+    """Visual metrics for one page pair, each given as (pixels, text boxes)."""
+    orig_pixels, orig_boxes = original
+    trans_pixels, trans_boxes = translated
+    shape = orig_pixels.shape
+    size_changed = trans_pixels.shape != shape
+    trans_mask = _text_mask(trans_boxes, trans_pixels.shape)
+    if size_changed:
+        trans_pixels = _resample(trans_pixels, shape)
+        trans_mask = _resample(trans_mask, shape)
+    # Grown by the SSIM window, so no graphics window overlaps text that was replaced
+    text = _text_mask(orig_boxes, shape) | trans_mask
+    graphics = _box_mean(text.astype(np.float64), SSIM_WINDOW) == 0
+    graphics_pixels = int(graphics.sum())
+
+    similarity = ssim_map(orig_pixels, trans_pixels)
+    changed = np.abs(orig_pixels.astype(np.int16) - trans_pixels.astype(np.int16)) > CHANGE_THRESHOLD
+    graphics_changed = changed & graphics
+
+    changed_bbox = None
+    if graphics_changed.any():
+        rows = np.flatnonzero(graphics_changed.any(axis=1))
+        cols = np.flatnonzero(graphics_changed.any(axis=0))
+        scale = 72 / dpi
+        changed_bbox = [round(float(cols[0]) * scale, 1), round(float(rows[0]) * scale, 1),
+                        round(float(cols[-1] + 1) * scale, 1), round(float(rows[-1] + 1) * scale, 1)]
+
+    orig_hashes = perceptual_hashes(orig_pixels)
+    trans_hashes = perceptual_hashes(trans_pixels)
+    return {
+        "page_number": page_number,
+        "size_changed": size_changed,
+        "ssim": round(float(similarity.mean()), 4),
+        "graphics_ssim": round(float(similarity[graphics].mean()), 4) if graphics_pixels else None,
+        "changed_ratio": round(float(changed.mean()), 4),
+        "graphics_ratio": round(graphics_pixels / graphics.size, 4),
+        "graphics_changed_ratio": round(int(graphics_changed.sum()) / graphics_pixels, 4) if graphics_pixels else 0.0,
+        "changed_bbox": changed_bbox,
+        "change_grid": region_density(graphics_changed),
+        **{f"{name}_distance": int(np.count_nonzero(orig_hashes[name] != trans_hashes[name])) for name in orig_hashes},
+        "original_phash": np.packbits(orig_hashes["phash"]).tobytes().hex(),
+        "translated_phash": np.packbits(trans_hashes["phash"]).tobytes().hex(),
+    }
+
+
+def _diff_page_range(original, translated, page_numbers: List[int], dpi: int,
+                     cache_dir, cache_max_bytes: int) -> Tuple[List[Dict], int]:
+    """Process pool job: metrics for a run of pages -> (page results, pages rendered)."""
+    cache = ThumbnailCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
+    orig_pages = _PageSource(original, dpi, cache)
+    try:
+        trans_pages = _PageSource(translated, dpi, cache)
+    except BaseException:
+        orig_pages.close()
+        raise
+    try:
+        pages = [diff_page_pixels(orig_pages.get(page_number), trans_pages.get(page_number), page_number, dpi)
+                 for page_number in page_numbers]
+    finally:
+        orig_pages.close()
+        trans_pages.close()
+    return pages, orig_pages.rendered + trans_pages.rendered
+
+
+def diff_visual(original, translated, dpi: int = DEFAULT_DPI, workers: Optional[int] = None,
+                cache_dir=DEFAULT_THUMBNAIL_DIR, cache_max_bytes: int = DEFAULT_THUMBNAIL_MAX_BYTES) -> Dict:
+    """Visual diff of two PDFs (paths or buffers), page by page.
+
+    Pages are split into contiguous runs across workers processes; buffers
+    are diffed in this process, since each worker would get a copy.
+    With cache_dir None nothing is cached.
+    """
+    with open_pdf(original) as doc:
+        orig_count = doc.page_count
+    with open_pdf(translated) as doc:
+        trans_count = doc.page_count
+    page_numbers = list(range(min(orig_count, trans_count)))
+
+    workers = min(workers or os.cpu_count() or 1, len(page_numbers))
+    if workers <= 1 or is_buffer(original) or is_buffer(translated):
+        pages, rendered = _diff_page_range(original, translated, page_numbers, dpi,
+                                           cache_dir, cache_max_bytes)
+    else:
+        run = math.ceil(len(page_numbers) / workers)
+        runs = [page_numbers[i:i + run] for i in range(0, len(page_numbers), run)]
+        pages, rendered = [], 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for run_pages, run_rendered in executor.map(
+                    _diff_page_range, [original] * len(runs), [translated] * len(runs),
+                    runs, [dpi] * len(runs), [cache_dir] * len(runs), [cache_max_bytes] * len(runs)):
+                pages.extend(run_pages)
+                rendered += run_rendered
+    if rendered and cache_dir is not None:
+        ThumbnailCache(cache_dir, cache_max_bytes).evict()
+
+    graphics_ssims = [page["graphics_ssim"] for page in pages if page["graphics_ssim"] is not None]
+    summary = {
+        "pages_compared": len(pages),
+        "pages_rendered": rendered,
+        "mean_ssim": round(sum(page["ssim"] for page in pages) / len(pages), 4) if pages else 1.0,
+        "min_ssim": min((page["ssim"] for page in pages), default=1.0),
+        "min_graphics_ssim": min(graphics_ssims, default=1.0),
+        "max_graphics_changed_ratio": max((page["graphics_changed_ratio"] for page in pages), default=0.0),
+        "max_phash_distance": max((page["phash_distance"] for page in pages), default=0),
+    }
+    return {
+        "dpi": dpi,
+        "checks": {
+            # Images, logos, graphics and watermarks: the non-text content still looks the same
+            "graphics_preserved": summary["min_graphics_ssim"] >= GRAPHICS_SSIM_PASS,
+            # Backgrounds: few non-text pixels changed by more than CHANGE_THRESHOLD
+            "background_maintained": summary["max_graphics_changed_ratio"] <= GRAPHICS_CHANGE_PASS,
+        },
+        "summary": summary,
+        "pages": pages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Visual diff of an original PDF and its translation")
+    parser.add_argument('original_pdf')
+    parser.add_argument('translated_pdf')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI, help='Render resolution')
+    parser.add_argument('--workers', type=int, help='Render processes (default: CPU count)')
+    parser.add_argument('--cache-dir', type=Path, default=DEFAULT_THUMBNAIL_DIR, help='Rendered page cache')
+    parser.add_argument('--no-cache', action='store_true', help='Render every page instead of using the cache')
+
+    args = parser.parse_args()
+
+    result = diff_visual(args.original_pdf, args.translated_pdf, args.dpi, args.workers,
+                         None if args.no_cache else args.cache_dir)
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())